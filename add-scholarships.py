@@ -1,12 +1,9 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-import re
+import argparse
+import sys
 from datetime import datetime, timezone
 
-# 🔐 Firebase Init
-cred = credentials.Certificate("firebase-key.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+import storage
+from ingest import BATCH_SIZE, backfill_amounts, ingest, read_records
 
 # ✅ 25 Real, Diverse Scholarships (across India)
 scholarships = [
@@ -606,13 +603,47 @@ scholarships = [
 
 ]
 
-# Upload to Firestore
-def clean_id(name):
-    return re.sub(r'[^\w\s-]', '', name).replace(" ", "_").lower()
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Import scholarships into the configured storage backend. With no files, uploads the built-in list.")
+    parser.add_argument("files", nargs="*", help="CSV or JSONL files ('-' for JSONL on stdin)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=4, help="batches committed in parallel")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--dry-run", action="store_true", help="validate and diff without writing")
+    parser.add_argument("--backfill-amounts", action="store_true",
+                        help="also set amount_value on stored documents that lack it")
+    parser.add_argument("--backfill-match", action="store_true",
+                        help="also write the normalized match map the Firestore eligibility query filters on")
+    args = parser.parse_args(argv)
 
-# 🔁 Upload
-for s in scholarships:
-    doc_id = clean_id(s['name'])
-    db.collection("scholarships").document(doc_id).set(s)
+    # 🔐 Firestore (or SQLite with STORAGE_BACKEND=sqlite)
+    store = storage.open_storage()
 
-print("✅ Re-uploaded with unique IDs successfully.")
+    if args.files:
+        records = (
+            (f"{path}:{line}", record)
+            for path in args.files
+            for line, record in read_records(path)
+        )
+    else:
+        records = ((f"built-in #{i}", s) for i, s in enumerate(scholarships, start=1))
+
+    report = ingest(store, records, batch_size=args.batch_size, workers=args.workers,
+                    retries=args.retries, dry_run=args.dry_run)
+    for source, message in report.errors:
+        print(f"❌ {source}: {message}", file=sys.stderr)
+    print(f"✅ {report}")
+
+    if args.backfill_amounts and not args.dry_run:
+        print(f"✅ Backfilled amount_value on {backfill_amounts(store)} documents.")
+    if args.backfill_match and not args.dry_run:
+        print(f"✅ Backfilled match on {store.backfill_match_fields()} documents.")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,50 @@
+import hashlib
+import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import re
 
 from flask import (
-    Flask, render_template, request, redirect, url_for, session, flash, abort
+    Flask, render_template, stream_template, request, redirect, url_for, session, flash, abort
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+from catalog import ScholarshipCatalog
+from deadlines import today
+from doc_cache import DocCache
+from fanout import Read, ReadTimeout, fan_out
+from hashing import HashingBusy, hasher
+import matches
+import metrics
+from pagination import Page, decode_cursor, parse_limit, start_after
+import storage
 
 # ---------------------------
-# Firebase
+# Storage (Firestore, or SQLite with STORAGE_BACKEND=sqlite)
 # ---------------------------
-cred = credentials.Certificate("firebase-key.json")
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+store = storage.open_storage()
+catalog = ScholarshipCatalog(store)
+# users/<email> and profiles/<email>, read on nearly every authenticated page
+users = DocCache("users", store.get_user, store.put_user)
+profiles = DocCache("profiles", store.get_profile, store.put_profile)
+# saved/applied ids per user; only ever changed through store.track
+user_states = DocCache("user_state", store.user_state, None)
+# matches/<email>: each user's eligible ids, maintained on write (matches.py)
+match_views = DocCache("matches", store.get_matches, store.put_matches)
+# the match refresh job's state: which older catalogs views may still be on
+job_states = DocCache("jobs", store.get_state, None)
+reconciled_to = None    # its catalog when match_views was last cleared
 
 # ---------------------------
 # Flask
 # ---------------------------
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "dev-secret-change-this")
+# Stream /results so the first cards are sent before the page is complete
+app.config["STREAM_RESULTS"] = os.getenv("STREAM_RESULTS", "0") == "1"
+# per-route latency and Firestore usage, served at /metrics
+metrics.init_app(app)
+# part of every page ETag, so a deploy that changes templates invalidates them
+RELEASE = os.getenv("RELEASE", "")
 
 # ---------------------------
 # Helpers
@@ -38,15 +60,28 @@ def login_required(view_func):
 def current_email():
     return session.get("user_email")
 
+def get_user_state(email: str) -> dict:
+    """``{"saved": {id: at}, "applied": {id: at}, "updated_at": ...}`` for the user."""
+    state_at = session.get("state_at", "")
+    return user_states.get(email, stale=lambda st: st.get("updated_at", "") < state_at)
+
+def track(kind: str, email: str, sid: str):
+    at = datetime.utcnow().isoformat()
+    if store.track(kind, email, sid, at):
+        user_states.invalidate(email)
+        # as with profile_at: other workers' cached state is older than this
+        session["state_at"] = at
+
 def clean_id(name: str) -> str:
     return re.sub(r"[^\w\s-]", "", name).replace(" ", "_").lower()
 
-def parse_amount(amount_str: str) -> int:
-    """Convert '₹1,80,000' or '100000' -> 180000"""
-    if not amount_str:
-        return 0
-    digits = re.sub(r"[^\d]", "", str(amount_str))
-    return int(digits) if digits else 0
+@app.errorhandler(ReadTimeout)
+def read_timeout(e):
+    return f"Timed out loading {e.name}. Please try again.", 504
+
+@app.errorhandler(HashingBusy)
+def hashing_busy(e):
+    return "Too many sign-ins right now. Please try again in a moment.", 503, {"Retry-After": "5"}
 
 # ---------------------------
 # Public pages
@@ -79,13 +114,12 @@ def signup():
         return render_template("signup.html")
 
     # Check if user exists
-    user_doc = db.collection("users").document(email).get()
-    if user_doc.exists:
+    if users.get(email) is not None:
         flash("Account already exists. Please log in.", "error")
         return redirect(url_for("login"))
 
-    password_hash = generate_password_hash(password)
-    db.collection("users").document(email).set({
+    password_hash = hasher.hash(password)
+    users.set(email, {
         "email": email,
         "password_hash": password_hash,
         "created_at": datetime.utcnow().isoformat()
@@ -102,16 +136,22 @@ def login():
     email = request.form.get("email", "").strip().lower()
     password = request.form.get("password", "")
 
-    user_doc = db.collection("users").document(email).get()
-    if not user_doc.exists:
+    user = users.get(email)
+    if user is None:
         flash("Invalid email or password.", "error")
         return render_template("login.html")
 
-    user = user_doc.to_dict()
-    if not check_password_hash(user.get("password_hash", ""), password):
+    if not hasher.verify(user.get("password_hash", ""), password):
         flash("Invalid email or password.", "error")
         return render_template("login.html")
 
+    # upgrade hashes made with older cost parameters while we have the password
+    if hasher.needs_rehash(user["password_hash"]):
+        try:
+            users.set(email, {**user, "password_hash": hasher.hash(password)})
+        except HashingBusy:
+            pass
+
     session["user_email"] = email
     return redirect(url_for("home"))
 
@@ -135,8 +175,7 @@ def home():
 @login_required
 def form():
     email = current_email()
-    doc = db.collection("profiles").document(email).get()
-    profile = doc.to_dict() if doc.exists else None
+    profile = get_profile(email)
 
     # If profile exists and not in edit mode -> readonly
     readonly = False
@@ -171,84 +210,194 @@ def submit_profile():
         "email": email,   # keep for convenience
     }
     # Save (doc id = email, so one per user)
-    db.collection("profiles").document(email).set(profile)
+    profiles.set(email, profile)
+    # lets any worker tell its cached copy is older than this submission
+    session["profile_at"] = profile["submitted_at"]
+    index = catalog.index()
+    save_match_view(email, matches.build(profile, index, catalog.deadlines(), catalog.fingerprint(index.docs)))
     return redirect(url_for("results"))
 
 # ---------------------------
 # Scholarship results + search/filter + save/apply
 # ---------------------------
+def eligible_for(email: str, profile: dict, index, deadlines):
+    """Scholarships the profile matches in listing order.
+
+    Read from the user's materialized view when it was built for this
+    profile and catalog; otherwise computed here and the view written for
+    next time.
+    """
+    view = get_match_view(email, profile)
+    if view is not None:
+        return catalog.get_many(view["ids"])
+    matched = sorted(index.eligible(profile), key=deadlines.order_key)
+    save_match_view(email, matches.view_for(
+        (s["id"] for s in matched), deadlines, catalog.fingerprint(index.docs), profile))
+    return matched
+
+def get_match_view(email: str, profile: dict):
+    """The user's materialized view if it was built for ``profile`` and the
+    current catalog."""
+    global reconciled_to
+    state = job_states.get(matches.STATE) or {}
+    if state.get("catalog") != reconciled_to:
+        # the job may have patched any view since it was cached here
+        reconciled_to = state.get("catalog")
+        match_views.clear()
+    catalogs = matches.fresh_catalogs(state, catalog.fingerprint())
+    view = match_views.get(email, stale=lambda v: not matches.is_fresh(v, profile, catalogs))
+    return view if matches.is_fresh(view, profile, catalogs) else None
+
+def save_match_view(email: str, view: dict):
+    """Best effort: without the view the next page view just rebuilds it."""
+    try:
+        match_views.set(email, view)
+    except Exception:
+        app.logger.warning("could not write the match view for %s", email, exc_info=True)
+
+def get_profile(email: str):
+    submitted_at = session.get("profile_at", "")
+    return profiles.get(email, stale=lambda p: str(p.get("submitted_at", "")) < submitted_at)
+
 def profile_or_404(email: str):
-    doc = db.collection("profiles").document(email).get()
-    if not doc.exists:
+    profile = get_profile(email)
+    if profile is None:
         abort(404, description="No profile found. Please complete your profile first.")
-    return doc.to_dict()
+    return profile
 
-def is_eligible(s: dict, user: dict) -> bool:
+# ---------------------------
+# Conditional GET
+# ---------------------------
+def _http_time(value):
     try:
-        gender_ok = (s.get("gender", "Any") == "Any" or s["gender"] == user["gender"])
-        edu_ok = (s.get("education", "").lower() == user.get("education", "").lower())
-        cat_ok = (s.get("category", "Any").lower() in ["any", user.get("category", "").lower()])
-        state_ok = (s.get("state", "All").lower() == "all" or s.get("state", "").lower() == user.get("state", "").lower())
-        income_ok = (int(user.get("income", 0)) <= int(s.get("max_income", 99999999)))
-        religion_ok = (s.get("religion", "Any") in ["Any", user.get("religion", "")])
-        disability_ok = (s.get("disability", "Any") in ["Any", user.get("disability", "")])
-        perc_ok = (int(user.get("percentage", 0)) >= int(s.get("min_percentage", 0)))
-        return all([gender_ok, edu_ok, cat_ok, state_ok, income_ok, religion_ok, disability_ok, perc_ok])
-    except Exception:
-        return False
+        stamp = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return stamp.replace(tzinfo=stamp.tzinfo or timezone.utc)
+
+def page_version(email: str):
+    """``(etag, last_modified)`` for the user's /results or /dashboard.
+
+    Built only from things already cached per worker: the catalog
+    fingerprint, the date (deadline badges change daily), the profile's
+    submitted_at and the saved/applied state's updated_at. The match view
+    is left out: it follows from the profile and the catalog, and is only
+    (re)built by the page itself. None until this worker has loaded the
+    catalog.
+    """
+    fingerprint = catalog.fingerprint()
+    if fingerprint is None:
+        return None
+    profile = get_profile(email)
+    state = get_user_state(email)
+    day = today()
+    stamps = [
+        str(profile.get("submitted_at", "")) if profile else "",
+        state.get("updated_at", ""),
+    ]
+    key = json.dumps([RELEASE, request.full_path, email, fingerprint, day.isoformat(), *stamps])
+    etag = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    times = [t for t in map(_http_time, [catalog.modified_at, *stamps]) if t is not None]
+    times.append(datetime(day.year, day.month, day.day, tzinfo=timezone.utc))
+    return etag, max(times)
+
+def conditional_page(view_func):
+    """Answer ``If-None-Match`` with 304 before ``view_func`` runs, and tag
+    its response with ETag / Last-Modified."""
+    def wrapper(*args, **kwargs):
+        version = page_version(current_email())
+        if version is None:
+            return view_func(*args, **kwargs)
+        etag, last_modified = version
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.make_response(view_func(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # browsers must revalidate; shared caches must not store per-user pages
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.add("Cookie")
+        return response
+    wrapper.__name__ = view_func.__name__
+    return wrapper
 
 @app.route("/results", methods=["GET"])
 @login_required
+@conditional_page
 def results():
     email = current_email()
-    profile = profile_or_404(email)
-
-    saved_ids = {
-        d.id.split("__", 1)[1]
-        for d in db.collection("saved").where("email", "==", email).stream()
-        if "__" in d.id
-    }
-    applied_ids = {
-        d.id.split("__", 1)[1]
-        for d in db.collection("applied").where("email", "==", email).stream()
-        if "__" in d.id
-    }
-
-    matched = []
-    today = datetime.utcnow()
-    for doc in db.collection("scholarships").stream():
-        s = doc.to_dict()
-        s["id"] = doc.id
-        # Do NOT skip saved/applied here (show all)
-        try:
-            deadline_dt = datetime.strptime(s.get("deadline", "2099-12-31"), "%Y-%m-%d")
-            s["is_closing_soon"] = (deadline_dt - today).days <= 7
-        except Exception:
-            s["is_closing_soon"] = False
 
-        if is_eligible(s, profile):
-            matched.append(s)
+    # Independent reads run concurrently
+    reads = fan_out(
+        profile=Read(profile_or_404, email),
+        state=Read(get_user_state, email),
+        index=Read(catalog.index),
+        deadlines=Read(catalog.deadlines),
+    )
+    profile = reads["profile"]
+    saved_ids = set(reads["state"]["saved"])
+    applied_ids = set(reads["state"]["applied"])
+    deadlines = reads["deadlines"]
+    closing_ids, expired_ids = deadlines.flags()
 
-    # client filters (search / amount)
+    # client filters (search / amount) + paging
     q = request.args.get("q", "").strip().lower()
     income_max = request.args.get("income_max", "").strip()
     amount_min = request.args.get("amount_min", "").strip()
+    cursor = request.args.get("cursor", "").strip()
+    limit = parse_limit(request.args.get("limit", "").strip())
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        abort(400, description="Invalid page cursor.")
 
-    if q:
-        matched = [s for s in matched if q in s.get("name", "").lower()]
-
+    # Numeric filters are range lookups on the catalog, intersected into
+    # one set of allowed ids
+    allowed = None
     if income_max.isdigit():
-        income_max_val = int(income_max)
-        matched = [s for s in matched if int(s.get("max_income", 0)) <= income_max_val]
-
+        allowed = catalog.incomes().at_most(int(income_max))
     if amount_min.isdigit():
-        amt_min_val = int(amount_min)
-        matched = [s for s in matched if parse_amount(s.get("amount", "0")) >= amt_min_val]
-
-    return render_template("results.html",
-                           scholarships=matched,
-                           saved_ids=saved_ids,
-                           applied_ids=applied_ids)
+        ids = catalog.amounts().at_least(int(amount_min))
+        allowed = ids if allowed is None else allowed & ids
+
+    def keep(s):
+        # Do NOT skip saved/applied here (show all), only expired ones
+        if s["id"] in expired_ids:
+            return False
+        return allowed is None or s["id"] in allowed
+
+    # Matches come sorted by deadlines.order_key, or by relevance when
+    # searching: jump to the cursor and filter lazily, only as far as the
+    # page needs
+    matched = eligible_for(email, profile, reads["index"], deadlines)
+    order_key = deadlines.order_key
+    if q:
+        scores = catalog.search_index().scores(q)
+        matched = sorted((s for s in matched if s["id"] in scores), key=lambda s: -scores[s["id"]])
+        rank = {s["id"]: i for i, s in enumerate(matched)}
+        order_key = lambda s: (f"{rank[s['id']]:08d}",)
+    start = start_after(matched, after, order_key)
+
+    def cards():
+        for i in range(start, len(matched)):
+            s = matched[i]
+            if keep(s):
+                s = dict(s)
+                s["is_closing_soon"] = s["id"] in closing_ids
+                yield s
+
+    page = Page(
+        cards(), order_key, limit,
+        url_for_cursor=lambda c: url_for("results", **{**request.args.to_dict(), "cursor": c}),
+    )
+    context = dict(scholarships=page, page=page, saved_ids=saved_ids, applied_ids=applied_ids)
+    if app.config["STREAM_RESULTS"]:
+        # stream_template keeps the request context alive via stream_with_context
+        return app.response_class(stream_template("results.html", **context))
+    return render_template("results.html", **context)
 
 
 @app.post("/save-scholarship")
@@ -258,13 +407,7 @@ def save_scholarship():
     sid = request.form.get("scholarship_id", "")
     if not sid:
         abort(400)
-    doc_id = f"{email}__{sid}"
-    if not db.collection("saved").document(doc_id).get().exists:
-        db.collection("saved").document(doc_id).set({
-            "email": email,
-            "scholarship_id": sid,
-            "saved_at": datetime.utcnow().isoformat(),
-        })
+    track("saved", email, sid)
     return redirect(url_for("results"))
 
 @app.post("/apply-scholarship")
@@ -274,13 +417,7 @@ def apply_scholarship():
     sid = request.form.get("scholarship_id", "")
     if not sid:
         abort(400)
-    doc_id = f"{email}__{sid}"
-    if not db.collection("applied").document(doc_id).get().exists:
-        db.collection("applied").document(doc_id).set({
-            "email": email,
-            "scholarship_id": sid,
-            "applied_at": datetime.utcnow().isoformat(),
-        })
+    track("applied", email, sid)
     return redirect(url_for("dashboard"))
 @app.route("/forgot-password", methods=["GET", "POST"])
 def forgot_password():
@@ -296,73 +433,56 @@ def forgot_password():
 # ---------------------------
 @app.route("/dashboard")
 @login_required
+@conditional_page
 def dashboard():
     email = current_email()
 
-    # --- Saved / Applied Scholarships ---
-    saved_docs = list(db.collection("saved").where("email", "==", email).stream())
-    applied_docs = list(db.collection("applied").where("email", "==", email).stream())
+    # Independent reads run concurrently
+    reads = fan_out(
+        state=Read(get_user_state, email),
+        profile=Read(get_profile, email),
+        index=Read(catalog.index),
+        deadlines=Read(catalog.deadlines),
+    )
+    saved_ids = set(reads["state"]["saved"])
+    applied_ids = set(reads["state"]["applied"])
+    deadlines = reads["deadlines"]
 
-    saved_ids = {d.id.split("__", 1)[1] for d in saved_docs if "__" in d.id}
-    applied_ids = {d.id.split("__", 1)[1] for d in applied_docs if "__" in d.id}
+    # --- Saved / Applied Scholarships ---
+    docs = fan_out(
+        saved=Read(catalog.get_many, saved_ids),
+        applied=Read(catalog.get_many, applied_ids),
+    )
 
     saved_schols = []
     applied_schols = []
 
-    for sid in saved_ids:
-        sdoc = db.collection("scholarships").document(sid).get()
-        if sdoc.exists:
-            s = sdoc.to_dict()
-            s["id"] = sid
-            # Annotate closing soon
-            try:
-                deadline_dt = datetime.strptime(s.get("deadline", "2099-12-31"), "%Y-%m-%d")
-                s["is_closing_soon"] = (deadline_dt - datetime.utcnow()).days <= 7
-            except Exception:
-                s["is_closing_soon"] = False
-            saved_schols.append(s)
-
-    for sid in applied_ids:
-        sdoc = db.collection("scholarships").document(sid).get()
-        if sdoc.exists:
-            s = sdoc.to_dict()
-            s["id"] = sid
-            # Annotate closing soon
-            try:
-                deadline_dt = datetime.strptime(s.get("deadline", "2099-12-31"), "%Y-%m-%d")
-                s["is_closing_soon"] = (deadline_dt - datetime.utcnow()).days <= 7
-            except Exception:
-                s["is_closing_soon"] = False
-            applied_schols.append(s)
+    for s in docs["saved"]:
+        s = dict(s)
+        s["is_closing_soon"] = deadlines.is_closing_soon(s)
+        saved_schols.append(s)
+
+    for s in docs["applied"]:
+        s = dict(s)
+        s["is_closing_soon"] = deadlines.is_closing_soon(s)
+        applied_schols.append(s)
 
     # --- Latest Profile ---
-    profile_doc = db.collection("profiles").document(email).get()
-    profile = profile_doc.to_dict() if profile_doc.exists else None
+    profile = reads["profile"]
 
     matched_schols = []
     if profile:
-        today = datetime.utcnow()
-        for sdoc in db.collection("scholarships").stream():
-            s = sdoc.to_dict()
-            s["id"] = sdoc.id
-            # Skip if already saved or applied
-            if s["id"] in saved_ids or s["id"] in applied_ids:
+        closing_ids, expired_ids = deadlines.flags()
+        for s in eligible_for(email, profile, reads["index"], deadlines):
+            # Skip if already saved or applied, or expired
+            if s["id"] in saved_ids or s["id"] in applied_ids or s["id"] in expired_ids:
                 continue
-            # Annotate closing soon
-            try:
-                deadline_dt = datetime.strptime(s.get("deadline", "2099-12-31"), "%Y-%m-%d")
-                s["is_closing_soon"] = (deadline_dt - today).days <= 7
-            except Exception:
-                s["is_closing_soon"] = False
-
-            if is_eligible(s, profile):
-                matched_schols.append(s)
+            s = dict(s)
+            s["is_closing_soon"] = s["id"] in closing_ids
+            matched_schols.append(s)
 
     # --- Deadlines for saved scholarships ---
-    deadlined = sum(
-        1 for s in saved_schols
-        if 0 <= (datetime.strptime(s.get("deadline", "2099-12-31"), "%Y-%m-%d") - datetime.utcnow()).days <= 7
-    )
+    deadlined = sum(1 for s in saved_schols if s["is_closing_soon"])
 
     stats = {
         "total_applied": len(applied_schols),
@@ -378,14 +498,6 @@ def dashboard():
         matched_scholarships=matched_schols
     )
 
-from apscheduler.schedulers.background import BackgroundScheduler
-from notify_users import notify_new_or_closing_scholarships
-
-scheduler = BackgroundScheduler()
-scheduler.add_job(func=notify_new_or_closing_scholarships, trigger="interval", hours=6)
-scheduler.start()
-
-
 # ---------------------------
 # Run
 # ---------------------------
@@ -0,0 +1,358 @@
+"""In-memory stand-in for the parts of ``firestore.client()`` the app uses.
+
+Covers collection / document / get / set / update / delete, where /
+order_by / limit / select / stream, get_all, write batches and on_snapshot, with
+the same filter semantics as Firestore for the operators we use, and
+counts document reads and writes the way Firestore bills them. ``install``
+points ``firebase_admin`` at a fake so ``app`` imports without
+``firebase-key.json``.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from numbers import Number
+
+_MISSING = object()
+
+
+def _copy(data):
+    # documents are mostly flat; only nested containers need copying
+    return {k: (_deep(v) if isinstance(v, (list, dict)) else v) for k, v in data.items()}
+
+
+def _deep(value):
+    if isinstance(value, dict):
+        return {k: _deep(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_deep(v) for v in value]
+    return value
+
+
+def _merge(stored, data):
+    merged = dict(stored)
+    for k, v in data.items():
+        if isinstance(v, dict) and isinstance(merged.get(k), dict):
+            merged[k] = _merge(merged[k], v)
+        else:
+            merged[k] = _deep(v)
+    return merged
+
+
+def _lookup(data, path):
+    for part in path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return _MISSING
+        data = data[part]
+    return data
+
+
+def _project(data, field_paths):
+    out = {}
+    for path in field_paths:
+        value = _lookup(data, path)
+        if value is _MISSING:
+            continue
+        *parents, last = path.split(".")
+        node = out
+        for part in parents:
+            node = node.setdefault(part, {})
+        node[last] = _deep(value)
+    return out
+
+
+def _comparable(a, b):
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b)
+    if isinstance(a, Number) and isinstance(b, Number):
+        return True
+    return type(a) is type(b)
+
+
+def _matches(value, op, target):
+    if value is _MISSING:
+        return False
+    if op == "==":
+        return _comparable(value, target) and value == target
+    if op == "!=":
+        return not (_comparable(value, target) and value == target)
+    if op in ("<", "<=", ">", ">="):
+        if not _comparable(value, target):
+            return False
+        return {"<": value < target, "<=": value <= target,
+                ">": value > target, ">=": value >= target}[op]
+    if op == "in":
+        return any(_comparable(value, t) and value == t for t in target)
+    if op == "not-in":
+        return not any(_comparable(value, t) and value == t for t in target)
+    if op == "array_contains":
+        return isinstance(value, list) and target in value
+    if op == "array_contains_any":
+        return isinstance(value, list) and any(t in value for t in target)
+    raise ValueError(f"unsupported operator {op!r}")
+
+
+# ---------------------------
+# Snapshots and references
+# ---------------------------
+class DocumentSnapshot:
+    def __init__(self, reference, data, read_time=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.read_time = read_time
+        self._data = data
+
+    def to_dict(self):
+        return _copy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        value = _lookup(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return _deep(value)
+
+
+class DocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    def get(self, field_paths=None, transaction=None):
+        return self._client._read(self, field_paths)
+
+    def set(self, data, merge=False):
+        self._client._write(self, data, merge=merge)
+
+    def update(self, data):
+        if self._client._raw(self) is None:
+            raise KeyError(f"no document to update: {self.path}")
+        self._client._write(self, data, merge="update")
+
+    def delete(self):
+        self._client._delete(self)
+
+
+class Query:
+    def __init__(self, client, collection, filters=(), orders=(), limit=None, fields=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._fields = fields
+
+    def _with(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders, limit=self._limit, fields=self._fields)
+        state.update(changes)
+        return Query(self._client, self._collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._with(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._with(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._with(limit=count)
+
+    def select(self, field_paths):
+        return self._with(fields=tuple(field_paths))
+
+    def stream(self, transaction=None):
+        return iter(self._client._query(self))
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class CollectionReference(Query):
+    def __init__(self, client, collection):
+        super().__init__(client, collection)
+        self.id = collection
+
+    def document(self, document_id=None):
+        return DocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, data, document_id=None):
+        ref = self.document(document_id)
+        ref.set(data)
+        return datetime.now(timezone.utc), ref
+
+    def on_snapshot(self, callback):
+        return self._client._watch(self._collection, callback)
+
+
+class Watch:
+    def __init__(self, client, collection, callback):
+        self._client = client
+        self._collection = collection
+        self._callback = callback
+        self.is_active = True
+
+    def unsubscribe(self):
+        self.is_active = False
+        self._client._unwatch(self)
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, reference, data, merge=False):
+        self._ops.append((reference, data, merge))
+
+    def update(self, reference, data):
+        self._ops.append((reference, data, "update"))
+
+    def delete(self, reference):
+        self._ops.append((reference, None, False))
+
+    def commit(self):
+        if len(self._ops) > 500:
+            raise ValueError("maximum 500 writes allowed per request")
+        client = self._client
+        with client._lock:
+            for reference, data, merge in self._ops:
+                if data is None:
+                    client._delete(reference, notify=False)
+                else:
+                    client._write(reference, data, merge=merge, notify=False)
+        # listeners see the batch as one change, as with real Firestore
+        changed = {}
+        for reference, _, _ in self._ops:
+            changed[reference._collection] = changed.get(reference._collection, 0) + 1
+        for collection, count in changed.items():
+            client._notify(collection, count)
+        self._ops = []
+
+
+# ---------------------------
+# Client
+# ---------------------------
+class FakeFirestore:
+    """``reads`` and ``writes`` count billed document operations."""
+
+    def __init__(self):
+        self._data = {}         # collection -> {id: dict}
+        self._watches = {}      # collection -> [Watch]
+        self._lock = threading.RLock()
+        self.reads = 0
+        self.writes = 0
+
+    def collection(self, collection_path):
+        return CollectionReference(self, collection_path)
+
+    def document(self, document_path):
+        collection, doc_id = document_path.split("/", 1)
+        return DocumentReference(self, collection, doc_id)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for ref in references:
+            yield self._read(ref, field_paths)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def reset_counters(self):
+        self.reads = self.writes = 0
+
+    def load(self, collection, docs):
+        """Bulk-load ``{id: dict}`` without counting writes (for seeding)."""
+        with self._lock:
+            self._data.setdefault(collection, {}).update(docs)
+
+    # --- internals ---
+    def _raw(self, ref):
+        return self._data.get(ref._collection, {}).get(ref.id)
+
+    def _read(self, ref, field_paths=None):
+        with self._lock:
+            self.reads += 1
+            data = self._raw(ref)
+            if data is not None and field_paths is not None:
+                data = {f: data[f] for f in field_paths if f in data}
+            return DocumentSnapshot(ref, data, time.time())
+
+    def _query(self, query):
+        with self._lock:
+            docs = self._data.get(query._collection, {})
+            hits = [
+                (doc_id, data) for doc_id, data in docs.items()
+                if all(_matches(_lookup(data, f), op, v) for f, op, v in query._filters)
+            ]
+            for field, direction in reversed(query._orders):
+                hits = [h for h in hits if _lookup(h[1], field) is not _MISSING]
+                hits.sort(key=lambda h: _lookup(h[1], field), reverse=direction == "DESCENDING")
+            if query._limit is not None:
+                hits = hits[:query._limit]
+            self.reads += max(1, len(hits))     # an empty result still bills one read
+            if query._fields is not None:
+                hits = [(doc_id, _project(data, query._fields)) for doc_id, data in hits]
+            return [DocumentSnapshot(DocumentReference(self, query._collection, doc_id), data)
+                    for doc_id, data in hits]
+
+    def _write(self, ref, data, merge=False, notify=True):
+        with self._lock:
+            self.writes += 1
+            docs = self._data.setdefault(ref._collection, {})
+            if merge and ref.id in docs:
+                # set(merge=True) merges nested maps; update() replaces the fields it names
+                docs[ref.id] = _merge(docs[ref.id], data) if merge is True else {**docs[ref.id], **_copy(data)}
+            else:
+                docs[ref.id] = _copy(data)
+        if notify:
+            self._notify(ref._collection)
+
+    def _delete(self, ref, notify=True):
+        with self._lock:
+            self.writes += 1
+            self._data.get(ref._collection, {}).pop(ref.id, None)
+        if notify:
+            self._notify(ref._collection)
+
+    def _snapshot(self, collection):
+        return [DocumentSnapshot(DocumentReference(self, collection, doc_id), data)
+                for doc_id, data in self._data.get(collection, {}).items()]
+
+    def _watch(self, collection, callback):
+        watch = Watch(self, collection, callback)
+        with self._lock:
+            self._watches.setdefault(collection, []).append(watch)
+            docs = self._snapshot(collection)
+            self.reads += len(docs)
+        callback(docs, [], datetime.now(timezone.utc))
+        return watch
+
+    def _unwatch(self, watch):
+        with self._lock:
+            watches = self._watches.get(watch._collection, [])
+            if watch in watches:
+                watches.remove(watch)
+
+    def _notify(self, collection, changed=1):
+        watches = self._watches.get(collection)
+        if not watches:
+            return
+        with self._lock:
+            docs = self._snapshot(collection)
+            self.reads += changed * len(watches)
+        for watch in list(watches):
+            watch._callback(docs, [], datetime.now(timezone.utc))
+
+
+def install(client=None):
+    """Make ``firebase_admin`` hand out ``client`` (a new fake by default)."""
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    client = client or FakeFirestore()
+    credentials.Certificate = lambda *args, **kwargs: object()
+    firebase_admin.initialize_app = lambda *args, **kwargs: None
+    firestore.client = lambda *args, **kwargs: client
+    return client
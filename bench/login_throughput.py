@@ -0,0 +1,90 @@
+"""Login throughput versus hashing worker count.
+
+Simulates ``--clients`` concurrent logins (one password verification each)
+against the inline hasher and process pools of increasing size, and
+reports verifications per second, latency, fast rejections and failed
+verifications (which should stay 0).
+
+    python bench/login_throughput.py --logins 200 --clients 16
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from hashing import HASH_METHOD, HashingBusy, PasswordHasher  # noqa: E402
+
+
+def run(hasher, stored, logins, clients):
+    latencies, rejected, failed = [], 0, 0
+    lock = threading.Lock()
+    remaining = iter(range(logins))
+
+    def client():
+        nonlocal rejected, failed
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            started = time.perf_counter()
+            try:
+                ok = hasher.verify(stored, "correct horse")
+            except HashingBusy:
+                with lock:
+                    rejected += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                if not ok:
+                    failed += 1
+
+    hasher.verify(stored, "warm up the pool")
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "per_second": len(latencies) / elapsed,
+        "p50_ms": 1000 * statistics.median(latencies) if latencies else 0,
+        "p95_ms": 1000 * latencies[int(len(latencies) * 0.95) - 1] if latencies else 0,
+        "rejected": rejected,
+        "failed": failed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent login requests")
+    parser.add_argument("--method", default=HASH_METHOD)
+    parser.add_argument("--max-pending", type=int, default=None, help="queue cap (default: no cap)")
+    args = parser.parse_args(argv)
+
+    stored = generate_password_hash("correct horse", args.method)
+    cores = os.cpu_count() or 1
+    sizes = [0] + sorted({1, 2, 4, cores // 2, cores} - {0})
+    print(f"{args.logins} logins, {args.clients} clients, {args.method}, {cores} cores")
+    print(f"{'workers':>8} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'rejected':>9} {'failed':>7}")
+    for workers in sizes:
+        hasher = PasswordHasher(args.method, workers, args.max_pending or args.logins)
+        try:
+            r = run(hasher, stored, args.logins, args.clients)
+        finally:
+            hasher.close()
+        label = workers or "inline"
+        print(f"{label:>8} {r['per_second']:9.1f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['rejected']:9d} {r['failed']:7d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
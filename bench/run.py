@@ -0,0 +1,324 @@
+"""Time the hot routes and jobs against an in-memory Firestore.
+
+Seeds a FakeFirestore (or, with ``--backend sqlite``, a temporary SQLite
+database) with synthetic data, imports the app against it and
+reports per scenario: wall time (min / median / p95), Firestore reads and
+writes per operation and peak Python allocation (tracemalloc, measured on
+a separate pass so it doesn't skew the timings). Reports are saved as JSON
+under bench/results/ so runs can be compared between commits.
+
+    python -m bench.run --scale small
+    python -m bench.run --scale 1000x10000 --only results dashboard
+    python -m bench.run --scale small --compare bench/results/<older>.json
+    python -m bench.run --scale small --backend sqlite
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+# must be set before the app modules read them
+os.environ.setdefault("MAIL_RATE_LIMIT", "0")
+os.environ.setdefault("MAIL_SERVER", "localhost")
+os.environ.setdefault("MAIL_USERNAME", "bench@example.org")
+
+sys.path.insert(0, ROOT)
+
+from bench import fake_firestore, synth  # noqa: E402
+
+
+def _rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return None
+
+
+def _git_label():
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD", "--", "*.py"], cwd=ROOT)
+    except (OSError, subprocess.CalledProcessError):
+        return "nogit"
+    return sha + ("-dirty" if dirty else "")
+
+
+# ---------------------------
+# Environment
+# ---------------------------
+class Env:
+    def __init__(self, n_scholarships, n_profiles, seed, backend="firestore"):
+        # with SQLite the fake stays installed but unused, so reads/writes are 0
+        self.db = fake_firestore.install()
+        started = time.perf_counter()
+        if backend == "sqlite":
+            path = os.path.join(tempfile.mkdtemp(prefix="scholarmatch-bench-"), "bench.db")
+            os.environ.update(STORAGE_BACKEND="sqlite", SQLITE_PATH=path)
+            import storage
+            storage.BACKEND, storage.SQLITE_PATH = "sqlite", path
+            self.scholarships, self.profiles = synth.populate_sqlite(
+                storage.SQLiteStorage(path), n_scholarships, n_profiles, seed)
+        else:
+            self.scholarships, self.profiles = synth.populate(self.db, n_scholarships, n_profiles, seed)
+        self.seed_seconds = time.perf_counter() - started
+        self.emails = list(self.profiles)
+
+        import app as webapp
+        webapp.app.config.update(TESTING=True, MAIL_SUPPRESS_SEND=True)
+        import matches
+        import notify_users
+        self.webapp = webapp
+        self.store = webapp.store
+        self.notify = notify_users
+        self.matches = matches
+        self.client = webapp.app.test_client()
+        # materialized views exist for everyone, as after the first job run
+        started = time.perf_counter()
+        matches.refresh(self.store, webapp.catalog, full=True)
+        self.materialize_seconds = time.perf_counter() - started
+
+    def get(self, path, email):
+        with self.client.session_transaction() as session:
+            session["user_email"] = email
+        response = self.client.get(path)
+        body = response.get_data()     # drains streamed responses too
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} as {email}: {response.status_code} {body[:200]!r}")
+        return body
+
+    def touch(self, fraction, seed):
+        """Mark a share of scholarships updated and profiles resubmitted, as
+        between two notifier runs; returns the watermark to run from."""
+        now = datetime.utcnow()
+        watermark = (now - timedelta(seconds=1)).isoformat()
+        stamp = now.isoformat()
+        k_s = max(1, int(len(self.scholarships) * fraction))
+        k_p = max(1, int(len(self.emails) * fraction))
+        step = seed * 7919
+        ids = list(self.scholarships)
+        touched = {ids[(step + i * 31) % len(ids)] for i in range(k_s)}
+        writes = [(sid, {**self.scholarships[sid], "updated_at": stamp}) for sid in sorted(touched)]
+        for start in range(0, len(writes), 500):
+            self.store.write_scholarships(writes[start:start + 500])
+        for i in range(k_p):
+            email = self.emails[(step + i * 17) % len(self.emails)]
+            self.store.put_profile(email, {**self.profiles[email], "submitted_at": stamp})
+        self.notify.save_watermark(watermark)
+        self.store.set_state(self.matches.STATE, {"watermark": watermark})
+        return watermark
+
+
+# ---------------------------
+# Scenarios
+# ---------------------------
+def scenarios(env, args):
+    """name -> (setup(i) or None, operation(i), repeat)."""
+    n = len(env.emails)
+    cursors = {}
+
+    def user(i):
+        return env.emails[(i * 7 + 1) % n]
+
+    def prepare_incremental(i):
+        env.touch(args.touch, i + 1)
+
+    def prepare_page2(i):
+        # the user has just seen page one, so their matches are cached
+        env.get("/results", user(i))
+        cursors[i] = _second_page_cursor(env, user(i))
+
+    return {
+        "results": (None, lambda i: env.get("/results", user(i)), args.repeat),
+        "results_repeat": (None, lambda i: env.get("/results", user(0)), args.repeat),
+        "results_search": (None, lambda i: env.get("/results?q=merit+scholarship", user(i)), args.repeat),
+        "results_filtered": (None, lambda i: env.get("/results?income_max=300000&amount_min=25000", user(i)),
+                             args.repeat),
+        "results_page2": (prepare_page2, lambda i: env.get("/results?cursor=" + cursors[i], user(i)),
+                          args.repeat),
+        "dashboard": (None, lambda i: env.get("/dashboard", user(i)), args.repeat),
+        "notify_incremental": (prepare_incremental,
+                               lambda i: env.notify.notify_new_or_closing_scholarships(), args.job_repeat),
+        "notify_full": (None, lambda i: env.notify.notify_new_or_closing_scholarships(full=True), args.job_repeat),
+        "refresh_matches": (prepare_incremental,
+                            lambda i: env.matches.refresh(env.store, env.webapp.catalog), args.job_repeat),
+    }
+
+
+def _second_page_cursor(env, email):
+    from pagination import encode_cursor
+    deadlines = env.webapp.catalog.deadlines()
+    matches = env.webapp.eligible_for(email, env.profiles[email], env.webapp.catalog.index(), deadlines)
+    if len(matches) < 30:
+        return ""
+    return encode_cursor(deadlines.order_key(matches[29]))
+
+
+def measure(env, setup, operation, repeat, memory=True):
+    timings, reads, writes = [], 0, 0
+    for i in range(repeat):
+        if setup:
+            setup(i)
+        env.db.reset_counters()
+        started = time.perf_counter()
+        operation(i)
+        timings.append(time.perf_counter() - started)
+        reads += env.db.reads
+        writes += env.db.writes
+
+    peak_kb = None
+    if memory:
+        if setup:
+            setup(repeat)
+        tracemalloc.start()
+        operation(repeat)
+        peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+
+    timings.sort()
+    ms = [1000 * t for t in timings]
+    return {
+        "n": repeat,
+        "min_ms": round(ms[0], 2),
+        "median_ms": round(statistics.median(ms), 2),
+        "p95_ms": round(ms[max(0, int(len(ms) * 0.95) - 1)], 2),
+        "mean_ms": round(statistics.fmean(ms), 2),
+        "reads": round(reads / repeat, 1),
+        "writes": round(writes / repeat, 1),
+        "peak_kb": peak_kb,
+    }
+
+
+def warm_up(env):
+    """Cold-start cost: first catalog load plus every index built over it."""
+    rss = _rss_kb()
+    env.db.reset_counters()
+    started = time.perf_counter()
+    catalog = env.webapp.catalog
+    catalog.scholarships()
+    catalog.index()
+    catalog.deadlines().flags()
+    catalog.search_index()
+    catalog.amounts()
+    catalog.incomes()
+    elapsed = time.perf_counter() - started
+    # the notifier's first incremental run loads every profile into its index
+    env.notify.save_watermark(datetime.utcnow().isoformat())
+    started = time.perf_counter()
+    env.notify.notify_new_or_closing_scholarships()
+    first_run = time.perf_counter() - started
+    after = _rss_kb()
+    return {
+        "catalog_ms": round(1000 * elapsed, 2),
+        "notify_first_run_ms": round(1000 * first_run, 2),
+        "materialize_all_ms": round(1000 * env.materialize_seconds, 2),
+        "reads": env.db.reads,
+        "rss_growth_kb": after - rss if rss is not None and after is not None else None,
+    }
+
+
+# ---------------------------
+# Reports
+# ---------------------------
+def print_report(report, baseline=None):
+    meta = report["meta"]
+    print(f"\n{meta['label']}  {meta['scholarships']} scholarships x {meta['profiles']} profiles  "
+          f"(python {meta['python']})")
+    w = report["warm_up"]
+    print(f"warm-up: catalog {w['catalog_ms']} ms, first notify run {w['notify_first_run_ms']} ms, "
+          f"{w['reads']} reads, rss +{w['rss_growth_kb']} KB")
+    header = f"{'scenario':<20} {'median ms':>10} {'p95 ms':>9} {'reads/op':>9} {'writes/op':>9} {'peak KB':>9}"
+    if baseline:
+        header += f" {'base ms':>9} {'change':>8}"
+    print(header)
+    base = (baseline or {}).get("scenarios", {})
+    for name, r in report["scenarios"].items():
+        line = (f"{name:<20} {r['median_ms']:>10} {r['p95_ms']:>9} {r['reads']:>9} {r['writes']:>9} "
+                f"{r['peak_kb'] if r['peak_kb'] is not None else '-':>9}")
+        if baseline:
+            old = base.get(name)
+            if old:
+                change = (r["median_ms"] - old["median_ms"]) / old["median_ms"] * 100 if old["median_ms"] else 0
+                line += f" {old['median_ms']:>9} {change:>+7.1f}%"
+            else:
+                line += f" {'-':>9} {'':>8}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark routes and jobs against an in-memory Firestore.")
+    parser.add_argument("--scale", default="small",
+                        help=f"one of {', '.join(synth.SCALES)} or SCHOLARSHIPSxPROFILES (default small)")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per route scenario")
+    parser.add_argument("--job-repeat", type=int, default=1, help="runs per job scenario")
+    parser.add_argument("--touch", type=float, default=0.01,
+                        help="share of documents changed before each incremental notify run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=("firestore", "sqlite"), default="firestore",
+                        help="storage backend the app runs against (default: in-memory Firestore)")
+    parser.add_argument("--only", nargs="+", metavar="SCENARIO", help="run only these scenarios")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--label", help="report name (default: git sha and scale)")
+    parser.add_argument("--compare", metavar="REPORT", help="earlier report to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    n_scholarships, n_profiles = synth.parse_scale(args.scale)
+    env = Env(n_scholarships, n_profiles, args.seed, args.backend)
+    suffix = "-sqlite" if args.backend == "sqlite" else ""
+    label = args.label or f"{_git_label()}-{n_scholarships}x{n_profiles}{suffix}"
+
+    report = {
+        "meta": {
+            "label": label,
+            "scholarships": n_scholarships,
+            "profiles": n_profiles,
+            "seed": args.seed,
+            "backend": args.backend,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "machine": f"{platform.machine()} {os.cpu_count()} cpus",
+            "date": datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        "warm_up": warm_up(env),
+        "scenarios": {},
+    }
+    available = scenarios(env, args)
+    unknown = set(args.only or ()) - set(available)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    for name, (setup, operation, repeat) in available.items():
+        if args.only and name not in args.only:
+            continue
+        report["scenarios"][name] = measure(env, setup, operation, repeat, memory=not args.no_memory)
+    env.notify.delivery.join()
+    report["meta"]["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{label}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nsaved {os.path.relpath(path, ROOT)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
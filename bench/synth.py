@@ -0,0 +1,162 @@
+"""Synthetic scholarships, profiles and saved/applied rows for benchmarks.
+
+Values come from the same vocabularies as the profile form and the
+built-in scholarship list, with a realistic share of "Any"/"All"
+wildcards, so match rates look like production rather than all-or-none.
+"""
+import random
+import re
+from datetime import datetime, timedelta
+
+from query_plan import MATCH_FIELD, match_fields
+
+GENDERS = ["Male", "Female", "Other"]
+EDUCATION = ["5th", "6th", "7th", "8th", "9th", "10th", "12th", "UG", "PG"]
+CATEGORIES = ["GEN", "OBC", "SC", "ST", "EWS", "Minority"]
+RELIGIONS = ["Hindu", "Muslim", "Christian", "Sikh", "Jain", "Buddhist", "Parsi", "Other"]
+STATES = [
+    "Andhra Pradesh", "Assam", "Bihar", "Delhi", "Gujarat", "Haryana", "Karnataka",
+    "Kerala", "Madhya Pradesh", "Maharashtra", "Odisha", "Punjab", "Rajasthan",
+    "Tamil Nadu", "Telangana", "Uttar Pradesh", "West Bengal",
+]
+COURSES = ["Engineering", "Medicine", "Arts", "Commerce", "Science", "Law", "Nursing", "Computer Science"]
+PROVIDERS = ["Foundation", "Trust", "Government of India", "State Government", "University", "Corporate CSR"]
+WORDS = ["Merit", "Excellence", "Future", "Leaders", "Women", "Rural", "Talent", "Vidya", "Pragati",
+         "Shiksha", "STEM", "Innovation", "Empowerment", "Post-Matric", "Pre-Matric", "National"]
+
+# preset name -> (scholarships, profiles)
+SCALES = {
+    "tiny": (200, 1_000),
+    "small": (1_000, 10_000),
+    "medium": (10_000, 50_000),
+    "large": (50_000, 200_000),
+}
+
+
+def parse_scale(text):
+    """``"small"`` or ``"1000x10000"`` -> (scholarships, profiles)."""
+    if text in SCALES:
+        return SCALES[text]
+    match = re.fullmatch(r"(\d+)[x×](\d+)", text.replace("_", "").replace("k", "000"))
+    if not match:
+        raise ValueError(f"scale must be one of {sorted(SCALES)} or NxM, got {text!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def _pick(rng, values, wildcard, share):
+    return wildcard if rng.random() < share else rng.choice(values)
+
+
+def scholarships(n, seed=0, today=None):
+    """``{doc_id: document}`` for ``n`` scholarships."""
+    rng = random.Random(seed)
+    today = today or datetime.utcnow()
+    docs = {}
+    for i in range(n):
+        name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} Scholarship {i}"
+        amount = rng.choice([5_000, 10_000, 12_000, 25_000, 50_000, 75_000, 100_000, 200_000])
+        created = today - timedelta(days=rng.randint(1, 365))
+        doc = {
+            "name": name,
+            "provider": f"{rng.choice(WORDS)} {rng.choice(PROVIDERS)}",
+            "education": rng.choice(EDUCATION),
+            "gender": _pick(rng, GENDERS[:2], "Any", 0.75),
+            "category": _pick(rng, CATEGORIES, "Any", 0.6),
+            "state": _pick(rng, STATES, "All", 0.65),
+            "religion": _pick(rng, RELIGIONS, "Any", 0.85),
+            "disability": _pick(rng, ["Yes"], "Any", 0.9),
+            "max_income": rng.choice([100_000, 250_000, 300_000, 600_000, 800_000, 1_000_000]),
+            "min_percentage": rng.choice([0, 0, 50, 55, 60, 75, 85]),
+            "amount": f"₹{amount:,} per year",
+            "amount_value": amount,
+            "deadline": (today + timedelta(days=rng.randint(-30, 150))).strftime("%Y-%m-%d"),
+            "apply_link": f"https://www.{rng.choice(WORDS).lower()}-scholarships.org/apply/{i}",
+            "created_at": created.isoformat(),
+            "updated_at": created.isoformat(),
+        }
+        docs[re.sub(r"[^\w\s-]", "", name).replace(" ", "_").lower()] = doc
+    return docs
+
+
+def email_for(i):
+    return f"student{i}@example.org"
+
+
+def profiles(n, seed=0, today=None):
+    """``{email: profile}`` for ``n`` students."""
+    rng = random.Random(seed + 1)
+    today = today or datetime.utcnow()
+    docs = {}
+    for i in range(n):
+        email = email_for(i)
+        docs[email] = {
+            "gender": rng.choice(GENDERS),
+            "education": rng.choice(EDUCATION),
+            "category": rng.choice(CATEGORIES),
+            "income": rng.choice([50_000, 120_000, 200_000, 280_000, 450_000, 700_000, 1_200_000]),
+            "state": rng.choice(STATES),
+            "dob": f"{rng.randint(1995, 2012)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "religion": rng.choice(RELIGIONS),
+            "disability": "Yes" if rng.random() < 0.05 else "No",
+            "course": rng.choice(COURSES),
+            "percentage": rng.randint(35, 99),
+            "submitted_at": (today - timedelta(days=rng.randint(1, 200))).isoformat(),
+            "email": email,
+        }
+    return docs
+
+
+def tracked(profile_docs, scholarship_ids, per_user=3, seed=0):
+    """``(saved, applied)`` rows keyed ``<email>__<scholarship id>``."""
+    rng = random.Random(seed + 2)
+    ids = list(scholarship_ids)
+    saved, applied = {}, {}
+    now = datetime.utcnow()
+    for email in profile_docs:
+        for sid in rng.sample(ids, min(len(ids), rng.randint(0, per_user * 2))):
+            rows, field = (saved, "saved_at") if rng.random() < 0.7 else (applied, "applied_at")
+            # tracked before any watermark a scenario runs from
+            at = (now - timedelta(days=rng.randint(1, 60))).isoformat()
+            rows[f"{email}__{sid}"] = {"email": email, "scholarship_id": sid, field: at}
+    return saved, applied
+
+
+def populate(db, n_scholarships, n_profiles, seed=0, per_user=3):
+    """Seed a FakeFirestore; returns the scholarship and profile dicts."""
+    schols = scholarships(n_scholarships, seed)
+    profs = profiles(n_profiles, seed)
+    saved, applied = tracked(profs, schols, per_user, seed)
+    # as FirestoreStorage.write_scholarships would store them
+    db.load("scholarships", {sid: {**doc, MATCH_FIELD: match_fields(doc)} for sid, doc in schols.items()})
+    db.load("profiles", profs)
+    db.load("saved", saved)
+    db.load("applied", applied)
+    db.load("user_state", user_states(profs, saved, applied))
+    return schols, profs
+
+
+def user_states(profile_docs, saved, applied):
+    """``user_state`` documents for every user, as after the migration."""
+    states = {email: {"saved": {}, "applied": {}, "updated_at": "", "migrated": True} for email in profile_docs}
+    for kind, rows in (("saved", saved), ("applied", applied)):
+        for row in rows.values():
+            state = states[row["email"]]
+            at = row[kind + "_at"]
+            state[kind][row["scholarship_id"]] = at
+            state["updated_at"] = max(state["updated_at"], at)
+    return states
+
+
+def populate_sqlite(store, n_scholarships, n_profiles, seed=0, per_user=3):
+    """Seed a SQLiteStorage with the same data as ``populate``."""
+    schols = scholarships(n_scholarships, seed)
+    profs = profiles(n_profiles, seed)
+    saved, applied = tracked(profs, schols, per_user, seed)
+    items = list(schols.items())
+    for start in range(0, len(items), 500):
+        store.write_scholarships(items[start:start + 500])
+    store.put_profiles(profs.items())
+    for kind, rows in (("saved", saved), ("applied", applied)):
+        field = kind + "_at"
+        store.track_many(kind, [(r["email"], r["scholarship_id"], r[field]) for r in rows.values()])
+    return schols, profs
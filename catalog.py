@@ -0,0 +1,208 @@
+import hashlib
+import json
+import threading
+import time
+
+from deadlines import DeadlineIndex
+from eligibility import EligibilityIndex
+from normalize import amount_value
+from range_index import RangeIndex
+from search_index import SearchIndex
+
+
+def fingerprint(docs):
+    """Digest of a scholarship list that's the same in every process holding
+    the same documents (``version`` is only a per-process counter)."""
+    digest = hashlib.sha1()
+    for s in docs:
+        content = s.get("content_hash") or json.dumps(s, sort_keys=True, default=str)
+        digest.update(f"{s['id']}\0{content}\0{s.get('updated_at', '')}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ---------------------------
+# Scholarship catalog cache
+# ---------------------------
+class ScholarshipCatalog:
+    """Process-level copy of the ``scholarships`` collection.
+
+    The collection is loaded once per worker and kept current with the
+    storage backend's change listener (Firestore ``on_snapshot``). Without
+    one the catalog reloads when the backend's ``scholarships_version``
+    moves on or, if it has none either, every ``poll_interval`` seconds.
+    Every rebuild bumps ``version``.
+
+    Documents handed out are shared between requests: copy before mutating.
+    """
+
+    def __init__(self, store, poll_interval=300, ready_timeout=10):
+        self.store = store
+        self.poll_interval = poll_interval
+        self.ready_timeout = ready_timeout
+
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._watch = None
+        self._watch_attempted = False
+        self._docs = None       # list of dicts, each with "id"
+        self._by_id = {}
+        self._derived = {}      # name -> structure built over the current docs
+        self._search = SearchIndex()
+        self._loaded_at = 0.0
+        self._source_version = None
+        self._fingerprint = None  # (docs, digest), computed on first use
+        self.modified_at = ""   # latest created_at / updated_at in the snapshot
+        self.version = 0
+
+    # --- loading ---
+    def _replace(self, docs):
+        by_id = {s["id"]: s for s in docs}
+        modified_at = max((t for s in docs for t in (s.get("created_at"), s.get("updated_at"))
+                           if isinstance(t, str)), default="")
+        with self._lock:
+            self._docs = docs
+            self._by_id = by_id
+            self.modified_at = modified_at
+            self._loaded_at = time.monotonic()
+            self.version += 1
+        self._ready.set()
+
+    def _stream(self):
+        source_version = self.store.scholarships_version()
+        self._replace(self.store.scholarships())
+        self._source_version = source_version
+
+    def _start_watch(self):
+        try:
+            self._watch = self.store.watch_scholarships(self._replace)
+        except Exception:
+            return False
+        return self._watch is not None and self._ready.wait(self.ready_timeout)
+
+    def _watching(self):
+        return self._watch is not None and getattr(self._watch, "is_active", True)
+
+    def _ensure_loaded(self):
+        if self._docs is not None:
+            if self._watching():
+                return
+            if self._source_version is not None and self._loaded_at:
+                if self.store.scholarships_version() == self._source_version:
+                    return
+            elif time.monotonic() - self._loaded_at < self.poll_interval:
+                return
+        with self._lock:
+            first = not self._watch_attempted
+            self._watch_attempted = True
+        if first and self._start_watch():
+            return
+        # another thread is starting the listener: wait for its first load
+        # rather than streaming the whole collection a second time
+        if not first and self._docs is None and self._ready.wait(self.ready_timeout):
+            return
+        self._stream()
+
+    # --- public API ---
+    def scholarships(self):
+        """All scholarship dicts (each with ``id``), in collection order."""
+        self._ensure_loaded()
+        return self._docs
+
+    def snapshot(self):
+        """``(version, scholarships)`` read together."""
+        self._ensure_loaded()
+        with self._lock:
+            return self.version, self._docs
+
+    def fingerprint(self, docs=None):
+        """Fingerprint of ``docs`` (a snapshot handed out earlier, e.g. an
+        index's ``docs``) or of the current snapshot; None if this process
+        hasn't loaded one yet (never triggers the first load)."""
+        if docs is None:
+            if self._docs is None:
+                return None
+            self._ensure_loaded()
+            docs = self._docs
+        cached = self._fingerprint
+        if cached is None or cached[0] is not docs:
+            cached = self._fingerprint = (docs, fingerprint(docs))
+        return cached[1]
+
+    def get(self, sid):
+        self._ensure_loaded()
+        return self._by_id.get(sid)
+
+    def get_many(self, ids):
+        """Scholarships for ``ids`` in the order given, skipping unknown ids.
+
+        Served from the snapshot when one is loaded; anything it can't answer
+        is fetched from the store in one batched read.
+        """
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        missing = ids
+        if self._docs is not None:
+            by_id = self._by_id
+            found = {sid: by_id[sid] for sid in ids if sid in by_id}
+            # a live listener already knows every document that exists
+            missing = [] if self._watching() else [sid for sid in ids if sid not in found]
+
+        if missing:
+            for s in self.store.get_scholarships(missing):
+                found[s["id"]] = s
+        return [found[sid] for sid in ids if sid in found]
+
+    def _build(self, name, factory):
+        version, docs = self.snapshot()
+        built = self._derived.get(name)
+        if built is None or built.docs is not docs:
+            built = factory(docs)
+            built.version = version
+            self._derived[name] = built
+        return built
+
+    def index(self):
+        """Eligibility lookup over the current snapshot, built on first use:
+        the backend's own (an indexed query) if it has one, else an
+        in-memory EligibilityIndex."""
+        return self._build("eligibility", lambda docs: self.store.eligibility_index(docs) or EligibilityIndex(docs))
+
+    def deadlines(self):
+        """DeadlineIndex over the current snapshot, built on first use."""
+        return self._build("deadlines", DeadlineIndex)
+
+    def amounts(self):
+        """RangeIndex on the numeric scholarship amount."""
+        return self._build("amounts", lambda docs: RangeIndex(docs, amount_value))
+
+    def incomes(self):
+        """RangeIndex on max_income (missing counts as 0, like the old filter)."""
+        return self._build("incomes", lambda docs: RangeIndex(docs, lambda s: int(s.get("max_income", 0))))
+
+    def search_index(self):
+        """SearchIndex kept in step with the current snapshot.
+
+        Unlike the structures above it is long-lived and only re-indexes the
+        documents that changed between snapshots.
+        """
+        version, docs = self.snapshot()
+        if self._search.docs is not docs:
+            self._search.sync(docs, version)
+        return self._search
+
+    def eligible(self, profile):
+        """Scholarships ``profile`` is eligible for, in collection order."""
+        return self.index().eligible(profile)
+
+    def invalidate(self):
+        """Force a reload on next access (for writes made by this process).
+
+        With a live listener this is a no-op: the write arrives through it.
+        """
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def close(self):
+        if self._watch:
+            self._watch.unsubscribe()
+        self._watch = None
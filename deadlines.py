@@ -0,0 +1,109 @@
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+# Window for the "closing soon" badge and reminder emails
+CLOSING_SOON_DAYS = int(os.getenv("CLOSING_SOON_DAYS", "7"))
+NO_DEADLINE = "2099-12-31"
+
+
+def parse_deadline(s: dict):
+    """Deadline of ``s`` as a date, or None if it can't be parsed."""
+    try:
+        return datetime.strptime(s.get("deadline", NO_DEADLINE), "%Y-%m-%d").date()
+    except Exception:
+        return None
+
+
+def today():
+    return datetime.utcnow().date()
+
+
+# ---------------------------
+# Deadline index
+# ---------------------------
+class DeadlineIndex:
+    """Deadlines of a scholarship list, parsed once and kept sorted.
+
+    "Closing within N days", "expired" and "next deadline" are bisects over
+    the sorted dates. Scholarships whose deadline doesn't parse are never
+    expired nor closing soon.
+    """
+
+    def __init__(self, scholarships, closing_days=CLOSING_SOON_DAYS):
+        self.docs = scholarships
+        self.closing_days = closing_days
+        self.by_id = {}
+
+        dated = []
+        for i, s in enumerate(scholarships):
+            deadline = parse_deadline(s)
+            self.by_id[s["id"]] = deadline
+            if deadline is not None:
+                dated.append((deadline, i))
+        dated.sort()
+        self.dates = [d for d, _ in dated]
+        self.positions = [i for _, i in dated]
+        self._flags = None
+
+    def deadline(self, s: dict):
+        sid = s.get("id")
+        if sid in self.by_id:
+            return self.by_id[sid]
+        return parse_deadline(s)
+
+    def order_key(self, s: dict):
+        """Stable listing order: earliest deadline first, then id."""
+        deadline = self.deadline(s)
+        return (deadline.isoformat() if deadline else "9999-12-31", s["id"])
+
+    def days_left(self, s: dict, on=None):
+        deadline = self.deadline(s)
+        if deadline is None:
+            return None
+        return (deadline - (on or today())).days
+
+    def _between(self, first, last):
+        lo = bisect_left(self.dates, first) if first is not None else 0
+        hi = bisect_right(self.dates, last) if last is not None else len(self.dates)
+        return [self.docs[i] for i in sorted(self.positions[lo:hi])]
+
+    def closing_within(self, days=None, on=None):
+        """Scholarships due today or in the next ``days`` days, in list order."""
+        on = on or today()
+        days = self.closing_days if days is None else days
+        return self._between(on, on + timedelta(days=days))
+
+    def entering_window(self, since, days=None, on=None):
+        """Scholarships whose closing-soon window opened after ``since`` and by ``on``."""
+        on = on or today()
+        days = self.closing_days if days is None else days
+        first = max(on, since + timedelta(days=days + 1))
+        return self._between(first, on + timedelta(days=days))
+
+    def expired(self, on=None):
+        """Scholarships whose deadline is before ``on``, in list order."""
+        on = on or today()
+        return self._between(None, on - timedelta(days=1))
+
+    def next_deadline(self, on=None):
+        """The scholarship with the earliest deadline on or after ``on``."""
+        k = bisect_left(self.dates, on or today())
+        return self.docs[self.positions[k]] if k < len(self.dates) else None
+
+    def flags(self, on=None):
+        """``(closing_soon_ids, expired_ids)`` for ``on``, cached per day."""
+        on = on or today()
+        if self._flags is None or self._flags[0] != on:
+            closing = {s["id"] for s in self.closing_within(on=on)}
+            expired = {s["id"] for s in self.expired(on=on)}
+            self._flags = (on, closing, expired)
+        return self._flags[1], self._flags[2]
+
+    def is_closing_soon(self, s: dict, on=None):
+        days = self.days_left(s, on)
+        return days is not None and 0 <= days <= self.closing_days
+
+    def is_expired(self, s: dict, on=None):
+        days = self.days_left(s, on)
+        return days is not None and days < 0
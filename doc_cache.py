@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from flask import g, has_app_context
+
+TTL = float(os.getenv("DOC_CACHE_TTL", "60"))
+MAX_ENTRIES = int(os.getenv("DOC_CACHE_SIZE", "20000"))
+
+
+# ---------------------------
+# Per-user document cache
+# ---------------------------
+class DocCache:
+    """Read-through TTL cache for one kind of small per-user document.
+
+    ``fetch(key)`` loads a document (None if missing) and ``write(key, data)``
+    stores one. Within a request (``flask.g``) each document is fetched at
+    most once, and concurrent misses for the same key share a single read. Only
+    existing documents are cached, so a document created by another process
+    shows up on the next read; ``set`` writes through. Entries can still be
+    up to ``ttl`` seconds behind writes made by other processes, which is
+    what ``stale`` is for: a predicate on the cached data that forces a
+    fresh read when it returns True.
+    """
+
+    def __init__(self, name, fetch, write, ttl=TTL, max_entries=MAX_ENTRIES):
+        self.name = name
+        self.fetch = fetch
+        self.write = write
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (stored_at, data)
+        self._inflight = {}             # key -> Future of the read in progress
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _request_memo(self):
+        if not has_app_context():
+            return None
+        memo = g.setdefault("_doc_cache", {})
+        return memo.setdefault(self.name, {})
+
+    def _store(self, key, data):
+        with self._lock:
+            self._entries.pop(key, None)
+            if data is not None:
+                self._entries[key] = (time.monotonic(), data)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def _fetch(self, key):
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            data = self.fetch(key)
+            self._store(key, data)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get(self, key, stale=None):
+        """The document as a dict, or None if it doesn't exist."""
+        memo = self._request_memo()
+        if memo is not None and key in memo:
+            data = memo[key]
+            return dict(data) if data is not None else None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                data = entry[1]
+            else:
+                data = None
+        if data is not None and stale is not None and stale(data):
+            data = None
+        if data is None:
+            self.misses += 1
+            data = self._fetch(key)
+        else:
+            self.hits += 1
+
+        if memo is not None:
+            memo[key] = data
+        return dict(data) if data is not None else None
+
+    def set(self, key, data):
+        """Write ``data`` as the whole document and cache it."""
+        self.write(key, data)
+        self._store(key, dict(data))
+        memo = self._request_memo()
+        if memo is not None:
+            memo[key] = dict(data)
+
+    def invalidate(self, key):
+        self._store(key, None)
+        memo = self._request_memo()
+        if memo is not None:
+            memo.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,214 @@
+from bisect import bisect_left, bisect_right
+
+
+# ---------------------------
+# Eligibility rule
+# ---------------------------
+def is_eligible(s: dict, user: dict) -> bool:
+    try:
+        gender_ok = (s.get("gender", "Any") == "Any" or s["gender"] == user["gender"])
+        edu_ok = (s.get("education", "").lower() == user.get("education", "").lower())
+        cat_ok = (s.get("category", "Any").lower() in ["any", user.get("category", "").lower()])
+        state_ok = (s.get("state", "All").lower() == "all" or s.get("state", "").lower() == user.get("state", "").lower())
+        income_ok = (int(user.get("income", 0)) <= int(s.get("max_income", 99999999)))
+        religion_ok = (s.get("religion", "Any") in ["Any", user.get("religion", "")])
+        disability_ok = (s.get("disability", "Any") in ["Any", user.get("disability", "")])
+        perc_ok = (int(user.get("percentage", 0)) >= int(s.get("min_percentage", 0)))
+        return all([gender_ok, edu_ok, cat_ok, state_ok, income_ok, religion_ok, disability_ok, perc_ok])
+    except Exception:
+        return False
+
+
+# ---------------------------
+# Match keys
+# ---------------------------
+# Categorical fields in the order is_eligible checks them. WILDCARD marks a
+# scholarship value that accepts every profile, NOMATCH a profile value that
+# only matches wildcard scholarships.
+CATEGORICAL_FIELDS = ("gender", "education", "category", "state", "religion", "disability")
+WILDCARD = object()
+NOMATCH = object()
+
+
+class Unindexable(Exception):
+    """A value is_eligible compares by equality but that can't be hashed."""
+
+
+def _hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        raise Unindexable(value)
+    return value
+
+
+def scholarship_keys(s: dict):
+    """Normalize ``s`` the way is_eligible reads it.
+
+    Returns ``(categorical, max_income, min_percentage)`` where ``categorical``
+    maps each field to a key or WILDCARD, or None if is_eligible would raise
+    on ``s`` for every profile. Raises Unindexable for values that can only be
+    compared pairwise.
+    """
+    try:
+        education = s.get("education", "").lower()
+        category = s.get("category", "Any").lower()
+        state = s.get("state", "All").lower()
+        max_income = int(s.get("max_income", 99999999))
+        min_percentage = int(s.get("min_percentage", 0))
+    except Exception:
+        return None
+
+    gender = s.get("gender", "Any")
+    religion = s.get("religion", "Any")
+    disability = s.get("disability", "Any")
+    categorical = {
+        "gender": WILDCARD if gender == "Any" else _hashable(gender),
+        "education": education,
+        "category": WILDCARD if category == "any" else category,
+        "state": WILDCARD if state == "all" else state,
+        "religion": WILDCARD if religion == "Any" else _hashable(religion),
+        "disability": WILDCARD if disability == "Any" else _hashable(disability),
+    }
+    return categorical, max_income, min_percentage
+
+
+def profile_keys(user: dict):
+    """Normalize a profile the way is_eligible reads it.
+
+    Returns ``(categorical, income, percentage)``, or None if the profile
+    matches nothing. Raises Unindexable like scholarship_keys.
+    """
+    try:
+        education = user.get("education", "").lower()
+        category = user.get("category", "").lower()
+        income = int(user.get("income", 0))
+        percentage = int(user.get("percentage", 0))
+    except Exception:
+        return None
+
+    # is_eligible only reads these when the scholarship isn't a wildcard, so a
+    # bad value there only costs the non-wildcard matches
+    try:
+        state = user.get("state", "").lower()
+    except Exception:
+        state = NOMATCH
+
+    categorical = {
+        "gender": _hashable(user["gender"]) if "gender" in user else NOMATCH,
+        "education": education,
+        "category": category,
+        "state": state,
+        "religion": _hashable(user.get("religion", "")),
+        "disability": _hashable(user.get("disability", "")),
+    }
+    return categorical, income, percentage
+
+
+# ---------------------------
+# Eligibility index
+# ---------------------------
+def _positions(mask: int):
+    bits = bin(mask)[:1:-1]
+    out = []
+    i = bits.find("1")
+    while i != -1:
+        out.append(i)
+        i = bits.find("1", i + 1)
+    return out
+
+
+class EligibilityIndex:
+    """Inverted index answering ``is_eligible`` for a whole scholarship list.
+
+    Each categorical field keeps a posting bitmap (an int, bit i = scholarship
+    i) per value plus one for its wildcard; ``max_income`` and
+    ``min_percentage`` keep their distinct values sorted with cumulative
+    bitmaps, so a profile's matches are a few ORs/ANDs and two bisects.
+    Scholarships with values that can't be indexed are checked with
+    is_eligible directly. Results come back in list order.
+    """
+
+    def __init__(self, scholarships):
+        self.docs = scholarships
+        self.postings = {f: {} for f in CATEGORICAL_FIELDS}
+        self.wildcards = dict.fromkeys(CATEGORICAL_FIELDS, 0)
+        self.residual = []
+
+        incomes = {}
+        percentages = {}
+        for i, s in enumerate(scholarships):
+            try:
+                keys = scholarship_keys(s)
+            except Unindexable:
+                self.residual.append(i)
+                continue
+            if keys is None:
+                continue
+            categorical, max_income, min_percentage = keys
+            bit = 1 << i
+            for field, key in categorical.items():
+                if key is WILDCARD:
+                    self.wildcards[field] |= bit
+                else:
+                    postings = self.postings[field]
+                    postings[key] = postings.get(key, 0) | bit
+            incomes[max_income] = incomes.get(max_income, 0) | bit
+            percentages[min_percentage] = percentages.get(min_percentage, 0) | bit
+
+        # income_masks[k]: max_income >= income_values[k]
+        self.income_values = sorted(incomes)
+        self.income_masks = [0] * len(self.income_values)
+        acc = 0
+        for k in range(len(self.income_values) - 1, -1, -1):
+            acc |= incomes[self.income_values[k]]
+            self.income_masks[k] = acc
+
+        # percentage_masks[k]: min_percentage <= percentage_values[k]
+        self.percentage_values = sorted(percentages)
+        self.percentage_masks = []
+        acc = 0
+        for value in self.percentage_values:
+            acc |= percentages[value]
+            self.percentage_masks.append(acc)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _mask(self, user):
+        keys = profile_keys(user)
+        if keys is None:
+            return 0
+        categorical, income, percentage = keys
+
+        k = bisect_left(self.income_values, income)
+        mask = self.income_masks[k] if k < len(self.income_masks) else 0
+        k = bisect_right(self.percentage_values, percentage) - 1
+        mask &= self.percentage_masks[k] if k >= 0 else 0
+
+        for field in CATEGORICAL_FIELDS:
+            if not mask:
+                break
+            key = categorical[field]
+            field_mask = self.wildcards[field]
+            if key is not NOMATCH:
+                field_mask |= self.postings[field].get(key, 0)
+            mask &= field_mask
+        return mask
+
+    def match_positions(self, user: dict):
+        """Positions of the scholarships ``user`` is eligible for."""
+        try:
+            positions = _positions(self._mask(user))
+        except Unindexable:
+            return [i for i, s in enumerate(self.docs) if is_eligible(s, user)]
+        if self.residual:
+            extra = [i for i in self.residual if is_eligible(self.docs[i], user)]
+            if extra:
+                positions = sorted(positions + extra)
+        return positions
+
+    def eligible(self, user: dict):
+        """Same as ``[s for s in scholarships if is_eligible(s, user)]``."""
+        docs = self.docs
+        return [docs[i] for i in self.match_positions(user)]
@@ -0,0 +1,130 @@
+import numpy as np
+
+from eligibility import (
+    CATEGORICAL_FIELDS, NOMATCH, WILDCARD, Unindexable,
+    is_eligible, profile_keys, scholarship_keys,
+)
+
+# Codes used in the categorical columns
+WILD = -1       # scholarship accepts any value
+UNKNOWN = -2    # profile value no scholarship asks for
+
+_INT64 = np.iinfo(np.int64)
+
+
+def _fits_int64(*values):
+    return all(_INT64.min <= v <= _INT64.max for v in values)
+
+
+# ---------------------------
+# Batch eligibility
+# ---------------------------
+class EligibilityMatrix:
+    """Vectorized users x scholarships version of ``is_eligible``.
+
+    The scholarship list is encoded once into columnar arrays (one integer
+    code per categorical field, plus max_income / min_percentage). Profiles
+    are encoded the same way and compared in chunks of rows, so memory stays
+    around ``max_cells`` booleans whatever the number of users. Values that
+    can't be encoded fall back to is_eligible for that row or column.
+    """
+
+    def __init__(self, scholarships, max_cells=1 << 23):
+        self.docs = scholarships
+        self.max_cells = max_cells
+        n = len(scholarships)
+
+        self.vocab = {f: {} for f in CATEGORICAL_FIELDS}
+        self.codes = {f: np.full(n, WILD, dtype=np.int32) for f in CATEGORICAL_FIELDS}
+        self.max_income = np.zeros(n, dtype=np.int64)
+        self.min_percentage = np.zeros(n, dtype=np.int64)
+        self.valid = np.zeros(n, dtype=bool)
+        self.residual = []
+
+        for j, s in enumerate(scholarships):
+            try:
+                keys = scholarship_keys(s)
+            except Unindexable:
+                self.residual.append(j)
+                continue
+            if keys is None:
+                continue
+            categorical, max_income, min_percentage = keys
+            if not _fits_int64(max_income, min_percentage):
+                self.residual.append(j)
+                continue
+            for field, key in categorical.items():
+                if key is not WILDCARD:
+                    vocab = self.vocab[field]
+                    self.codes[field][j] = vocab.setdefault(key, len(vocab))
+            self.max_income[j] = max_income
+            self.min_percentage[j] = min_percentage
+            self.valid[j] = True
+
+    def __len__(self):
+        return len(self.docs)
+
+    @property
+    def chunk_size(self):
+        return max(1, self.max_cells // max(1, len(self.docs)))
+
+    def _encode(self, profiles):
+        m = len(profiles)
+        codes = {f: np.full(m, UNKNOWN, dtype=np.int32) for f in CATEGORICAL_FIELDS}
+        income = np.zeros(m, dtype=np.int64)
+        percentage = np.zeros(m, dtype=np.int64)
+        empty = np.zeros(m, dtype=bool)
+        fallback = []
+
+        for i, user in enumerate(profiles):
+            try:
+                keys = profile_keys(user)
+            except Unindexable:
+                fallback.append(i)
+                continue
+            if keys is None:
+                empty[i] = True
+                continue
+            categorical, user_income, user_percentage = keys
+            if not _fits_int64(user_income, user_percentage):
+                fallback.append(i)
+                continue
+            for field, key in categorical.items():
+                if key is not NOMATCH:
+                    codes[field][i] = self.vocab[field].get(key, UNKNOWN)
+            income[i] = user_income
+            percentage[i] = user_percentage
+        return codes, income, percentage, empty, fallback
+
+    def compute(self, profiles):
+        """Boolean matrix, ``[i, j]`` = is_eligible(scholarships[j], profiles[i])."""
+        codes, income, percentage, empty, fallback = self._encode(profiles)
+
+        ok = (income[:, None] <= self.max_income[None, :])
+        ok &= (percentage[:, None] >= self.min_percentage[None, :])
+        ok &= self.valid[None, :]
+        for field in CATEGORICAL_FIELDS:
+            col = self.codes[field]
+            ok &= (col == WILD)[None, :] | (codes[field][:, None] == col[None, :])
+        ok[empty] = False
+
+        for j in self.residual:
+            s = self.docs[j]
+            ok[:, j] = [is_eligible(s, user) for user in profiles]
+        for i in fallback:
+            user = profiles[i]
+            ok[i] = [is_eligible(s, user) for s in self.docs]
+        return ok
+
+    def iter_chunks(self, profiles, chunk_size=None):
+        """Yield ``(start, matrix)`` for consecutive slices of ``profiles``."""
+        step = chunk_size or self.chunk_size
+        for start in range(0, len(profiles), step):
+            yield start, self.compute(profiles[start:start + step])
+
+    def iter_matches(self, profiles, chunk_size=None):
+        """Yield ``(profile_index, [eligible scholarships])`` for every profile."""
+        docs = self.docs
+        for start, ok in self.iter_chunks(profiles, chunk_size):
+            for offset, row in enumerate(ok):
+                yield start + offset, [docs[j] for j in np.flatnonzero(row)]
@@ -0,0 +1,72 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+DEFAULT_TIMEOUT = float(os.getenv("FANOUT_TIMEOUT", "10"))
+MAX_WORKERS = int(os.getenv("FANOUT_WORKERS", "16"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ReadTimeout(TimeoutError):
+    """A fanned-out read didn't finish within its timeout."""
+
+    def __init__(self, name, timeout):
+        super().__init__(f"{name} did not complete within {timeout}s")
+        self.name = name
+        self.timeout = timeout
+
+
+class Read:
+    """One independent call for fan_out: ``Read(fn, *args, timeout=2.0)``."""
+
+    def __init__(self, fn, *args, timeout=None, **kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+
+    def __call__(self):
+        return self.fn(*self.args, **self.kwargs)
+
+
+def _pool():
+    # created lazily so each gunicorn worker gets its own threads after fork
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="fanout")
+    return _executor
+
+
+def fan_out(**reads):
+    """Run independent reads concurrently and return ``{name: result}``.
+
+    Each read runs on the shared pool in a copy of the caller's context, so
+    Flask's request/app context is available inside it. Results are joined
+    in argument order: the first read that raised re-raises its exception
+    here, and a read still running past its own timeout raises ReadTimeout.
+    """
+    pool = _pool()
+    started = time.monotonic()
+    futures = {
+        name: pool.submit(contextvars.copy_context().run, read)
+        for name, read in reads.items()
+    }
+    results = {}
+    try:
+        for name, future in futures.items():
+            timeout = reads[name].timeout
+            remaining = max(0.0, started + timeout - time.monotonic())
+            try:
+                results[name] = future.result(timeout=remaining)
+            except FutureTimeout:
+                raise ReadTimeout(name, timeout) from None
+    finally:
+        for future in futures.values():
+            future.cancel()
+    return results
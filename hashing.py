@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Werkzeug method string, e.g. "scrypt" or "scrypt:65536:8:1" or "pbkdf2:sha256:600000"
+HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+# The Procfile runs WEB_CONCURRENCY gunicorn processes (gunicorn's own
+# default is 1) with WEB_THREADS threads each. Every process has its own
+# pool, so the cores are split between them, and at most half of a
+# process's threads may wait on a hash; the rest keep serving other pages.
+WEB_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+WEB_THREADS = max(1, int(os.getenv("WEB_THREADS", "16")))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", max(1, (os.cpu_count() or 1) // WEB_WORKERS)))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", max(1, min(HASH_WORKERS * 4, WEB_THREADS // 2))))
+HASH_TIMEOUT = float(os.getenv("HASH_TIMEOUT", "10"))
+
+
+class HashingBusy(RuntimeError):
+    """Too many password hashes are already queued, or one took longer than
+    the timeout; try again shortly."""
+
+
+def _method_of(password_hash: str) -> str:
+    return password_hash.split("$", 1)[0]
+
+
+# ---------------------------
+# Hashing executor
+# ---------------------------
+class PasswordHasher:
+    """Runs password hashing on a process pool instead of the request thread.
+
+    At most ``max_pending`` hashes may be queued or running per process;
+    beyond that calls fail fast with HashingBusy rather than piling up
+    behind a login burst. A hash that outlives ``timeout`` also raises
+    HashingBusy, and keeps its slot until the pool finishes it.
+    ``workers=0`` hashes inline.
+    """
+
+    def __init__(self, method=HASH_METHOD, workers=HASH_WORKERS,
+                 max_pending=HASH_MAX_PENDING, timeout=HASH_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._method_string = None
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _executor(self):
+        # created lazily so each gunicorn worker has its own pool. By then the
+        # worker runs threads (gthread, gRPC, the catalog listener), so the
+        # pool processes come from a fork server rather than a fork of this
+        # process: no locks held by other threads, no copy of the catalog
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver"))
+        return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingBusy("password hashing queue is full")
+        try:
+            future = self._executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()     # frees the slot now if it never started
+            self.timed_out += 1
+            raise HashingBusy("password hashing timed out") from None
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Whether ``password_hash`` was made with other cost parameters than ``method``."""
+        if self._method_string is None:
+            # expand defaults ("scrypt" -> "scrypt:32768:8:1") the way Werkzeug does
+            self._method_string = _method_of(generate_password_hash("", self.method))
+        return _method_of(password_hash) != self._method_string
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,219 @@
+import csv
+import hashlib
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+from normalize import parse_amount
+
+BATCH_SIZE = 500        # Firestore's limit for one WriteBatch
+# Bookkeeping fields that don't count as content
+META_FIELDS = {"content_hash", "created_at", "updated_at"}
+DEFAULTS = {"gender": "Any", "category": "Any", "state": "All", "religion": "Any", "disability": "Any"}
+INT_FIELDS = ("max_income", "min_percentage")
+
+
+def clean_id(name):
+    return re.sub(r'[^\w\s-]', '', name).replace(" ", "_").lower()
+
+
+# ---------------------------
+# Reading
+# ---------------------------
+def read_records(path):
+    """Yield ``(line, record)`` from a CSV or JSONL file, one row at a time.
+
+    ``-`` reads JSONL from stdin. Rows that aren't valid JSON are yielded
+    as ``(line, ValueError)`` so the caller can count them as failed.
+    """
+    if path == "-":
+        handle = sys.stdin
+    else:
+        handle = open(path, newline="", encoding="utf-8-sig")
+    with handle:
+        if path.lower().endswith(".csv"):
+            for line, row in enumerate(csv.DictReader(handle), start=2):
+                yield line, {k.strip(): v for k, v in row.items() if k and v not in (None, "")}
+            return
+        for line, text in enumerate(handle, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except ValueError as e:
+                yield line, ValueError(f"invalid JSON: {e}")
+
+
+# ---------------------------
+# Validation
+# ---------------------------
+def _to_int(field, value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        digits = re.sub(r"[\s,₹]", "", value)
+        if digits.isdigit():
+            return int(digits)
+    raise ValueError(f"bad {field} {value!r}, expected a whole number")
+
+
+def normalize_record(raw):
+    """Validated Firestore document for one input record; raises ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError("record is not an object")
+    s = {k: v.strip() if isinstance(v, str) else v for k, v in raw.items()}
+
+    if not s.get("name"):
+        raise ValueError("missing name")
+    if not s.get("education"):
+        raise ValueError("missing education")
+    if "deadline" in s:
+        try:
+            datetime.strptime(s["deadline"], "%Y-%m-%d")
+        except (TypeError, ValueError):
+            raise ValueError(f"bad deadline {s['deadline']!r}, expected YYYY-MM-DD")
+    for field in INT_FIELDS:
+        if field in s:
+            s[field] = _to_int(field, s[field])
+    for field, default in DEFAULTS.items():
+        s.setdefault(field, default)
+    if "amount" in s:
+        s["amount_value"] = parse_amount(s["amount"])
+
+    doc_id = s.pop("id", None) or clean_id(s["name"])
+    if not doc_id:
+        raise ValueError("name gives an empty document id")
+    return doc_id, s
+
+
+def content_hash(doc):
+    content = {k: v for k, v in doc.items() if k not in META_FIELDS}
+    blob = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# ---------------------------
+# Writing
+# ---------------------------
+class IngestReport:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.errors = []    # (source, message)
+
+    def fail(self, source, message, count=1):
+        self.failed += count
+        self.errors.append((source, message))
+
+    def __str__(self):
+        return (f"inserted={self.inserted} updated={self.updated} "
+                f"unchanged={self.unchanged} failed={self.failed}")
+
+
+def _with_retry(fn, retries):
+    delay = 0.5
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+def ingest(store, records, batch_size=BATCH_SIZE,
+           workers=4, retries=5, dry_run=False, report=None):
+    """Write ``records`` (an iterable of ``(source, record)``) idempotently.
+
+    Records are validated and normalized, then handled ``batch_size`` at a
+    time: the stored content hashes for the chunk are fetched in one read
+    and only new or changed documents are written, as one atomic batch
+    committed on a pool of ``workers`` threads with retry and exponential
+    backoff. Memory stays bounded by the chunks in flight.
+    """
+    report = report or IngestReport()
+    now = datetime.utcnow().isoformat()
+
+    def plan(chunk):
+        existing = _with_retry(lambda: store.stored_hashes(list(chunk)), retries)
+        writes, inserted, updated = [], 0, 0
+        for doc_id, doc in chunk.items():
+            doc["content_hash"] = content_hash(doc)
+            stored = existing.get(doc_id)
+            if stored is not None:
+                if stored.get("content_hash") == doc["content_hash"]:
+                    report.unchanged += 1
+                    continue
+                doc["created_at"] = stored.get("created_at") or doc.get("created_at") or now
+                updated += 1
+            else:
+                doc.setdefault("created_at", now)
+                inserted += 1
+            doc["updated_at"] = now
+            writes.append((doc_id, doc))
+        return writes, inserted, updated
+
+    def settle(done):
+        for future in done:
+            writes, inserted, updated = pending.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                report.fail(f"batch of {len(writes)} starting {writes[0][0]}", str(e), len(writes))
+            else:
+                report.inserted += inserted
+                report.updated += updated
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        chunk = {}
+
+        def flush():
+            writes, inserted, updated = plan(chunk)
+            if not writes:
+                return
+            if dry_run:
+                report.inserted += inserted
+                report.updated += updated
+                return
+            while len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                settle(done)
+            pending[pool.submit(_with_retry, lambda: store.write_scholarships(writes), retries)] = (writes, inserted, updated)
+
+        for source, raw in records:
+            if isinstance(raw, Exception):
+                report.fail(source, str(raw))
+                continue
+            try:
+                doc_id, doc = normalize_record(raw)
+            except ValueError as e:
+                report.fail(source, str(e))
+                continue
+            chunk[doc_id] = doc     # a later row with the same id wins
+            if len(chunk) >= batch_size:
+                flush()
+                chunk = {}
+        if chunk:
+            flush()
+        settle(list(pending))
+    return report
+
+
+def backfill_amounts(store):
+    """Set ``amount_value`` on stored documents where it's missing or stale."""
+    backfilled = 0
+    for s in store.scholarships():
+        value = parse_amount(s.get("amount"))
+        if s.get("amount_value") != value:
+            store.update_scholarship(s["id"], {"amount_value": value})
+            backfilled += 1
+    return backfilled
@@ -0,0 +1,246 @@
+"""Background job runner.
+
+Runs the scheduled jobs in their own process (the ``worker`` line in the
+Procfile) so web workers never do. Every run first takes a lease, kept in
+Firestore by default or as a local file lock with ``JOB_LOCK=file`` (always
+the case with the SQLite storage backend), so only one runner executes a
+given job even when several are deployed.
+
+    python -m jobs                      # run the scheduler
+    python -m jobs --once notify_users  # run one job now (e.g. from cron)
+"""
+import argparse
+import fcntl
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+from firebase_admin import firestore
+
+import metrics
+import storage
+
+LOCK_BACKEND = os.getenv("JOB_LOCK", "firestore")     # "firestore" or "file"
+LOCK_DIR = os.getenv("JOB_LOCK_DIR", "/tmp")
+LEASE_TTL = int(os.getenv("JOB_LEASE_TTL", 600))      # seconds; renewed while the job runs
+RENEW_RETRY = 5                                        # seconds between renewals after one fails
+METRICS_PORT = int(os.getenv("JOBS_METRICS_PORT", 0))  # serve /metrics from the runner when set
+MATCHES_INTERVAL = float(os.getenv("MATCHES_REFRESH_MINUTES", 10)) / 60   # hours
+
+log = logging.getLogger("jobs")
+
+
+# ---------------------------
+# Leases
+# ---------------------------
+class LeaseLost(RuntimeError):
+    """The job's lease expired or couldn't be renewed; another runner may own it."""
+
+
+class FirestoreLease:
+    """Leader lease on ``locks/<name>``: held by one owner until it expires.
+
+    The holder renews it every ``ttl / 3`` seconds while the job runs, so a
+    crashed runner only blocks the job for at most ``ttl`` seconds.
+    """
+
+    def __init__(self, db, name, ttl=LEASE_TTL, owner=None):
+        self.db = db
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.ref = db.collection("locks").document(name)
+
+    def _claim(self, take):
+        @firestore.transactional
+        def run(transaction):
+            snap = self.ref.get(transaction=transaction)
+            data = snap.to_dict() if snap.exists else {}
+            now = time.time()
+            mine = data.get("owner") == self.owner
+            if not mine and data.get("expires_at", 0) > now:
+                return False
+            if take:
+                transaction.set(self.ref, {"owner": self.owner, "expires_at": now + self.ttl})
+            elif mine:
+                transaction.delete(self.ref)
+            return True
+
+        return run(self.db.transaction())
+
+    def acquire(self):
+        return self._claim(take=True)
+
+    def renew(self):
+        return self._claim(take=True)
+
+    def release(self):
+        self._claim(take=False)
+
+
+class FileLease:
+    """Non-blocking ``flock`` on a local file; only excludes runners on one host."""
+
+    def __init__(self, name, directory=LOCK_DIR):
+        self.path = os.path.join(directory, f"scholarmatch-{name}.lock")
+        self.ttl = None
+        self._handle = None
+
+    def acquire(self):
+        handle = open(self.path, "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._handle = handle
+        return True
+
+    def renew(self):
+        return self._handle is not None
+
+    def release(self):
+        if self._handle is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+
+
+def make_lease(name):
+    from app import store
+    if LOCK_BACKEND == "file" or not isinstance(store, storage.FirestoreStorage):
+        return FileLease(name)
+    # the store's client, so lease reads and writes are counted like the job's
+    return FirestoreLease(store.db, name)
+
+
+def run_exclusive(name, fn, lease=None):
+    """Run ``fn(check)`` if this process wins the lease for ``name``; return whether it ran.
+
+    ``check()`` raises LeaseLost once the lease is gone: renewal returned
+    False, or kept failing until too little of the lease was left to be
+    sure of it. Jobs call it before every side effect another runner
+    could repeat (sending mail, saving a watermark).
+    """
+    lease = lease or make_lease(name)
+    if not lease.acquire():
+        log.info("job %s: lease held elsewhere, skipping", name)
+        return False
+
+    stop = threading.Event()
+    lost = threading.Event()
+
+    def heartbeat():
+        renewed = time.monotonic()
+        interval = lease.ttl / 3
+        while not stop.wait(interval):
+            try:
+                held = lease.renew()
+            except Exception:
+                log.warning("job %s: lease renewal failed", name, exc_info=True)
+                # keep retrying while at least a third of the lease is left
+                held = None if time.monotonic() - renewed < lease.ttl * 2 / 3 else False
+            if held is None:
+                interval = min(RENEW_RETRY, lease.ttl / 3)
+                continue
+            if not held:
+                log.warning("job %s: lost its lease", name)
+                lost.set()
+                return
+            renewed = time.monotonic()
+            interval = lease.ttl / 3
+
+    def check():
+        if lost.is_set():
+            raise LeaseLost(name)
+
+    if lease.ttl:
+        threading.Thread(target=heartbeat, name=f"lease-{name}", daemon=True).start()
+    started = time.monotonic()
+    try:
+        with metrics.job(name) as usage:
+            result = fn(check)
+        log.info("job %s done in %.1fs: %s %s", name, time.monotonic() - started, result, usage.as_dict())
+    finally:
+        stop.set()
+        lease.release()
+    return True
+
+
+# ---------------------------
+# Jobs
+# ---------------------------
+def notify_users(check):
+    from notify_users import notify_new_or_closing_scholarships
+    return notify_new_or_closing_scholarships(check=check)
+
+
+def refresh_matches(check):
+    import matches
+    from app import catalog, store
+    return matches.refresh(store, catalog, check=check)
+
+
+# name -> (function, interval in hours)
+JOBS = {
+    "notify_users": (notify_users, 6),
+    "refresh_matches": (refresh_matches, MATCHES_INTERVAL),
+}
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(port):
+    server = ThreadingHTTPServer(("", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run ScholarMatch background jobs.")
+    parser.add_argument("--once", choices=sorted(JOBS), help="run one job now and exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    # importing app opens the storage backend (and Firebase) for the lease and the jobs
+    import app  # noqa: F401
+
+    if args.once:
+        run_exclusive(args.once, JOBS[args.once][0])
+        return 0
+
+    if METRICS_PORT:
+        serve_metrics(METRICS_PORT)
+    scheduler = BlockingScheduler()
+    for name, (fn, hours) in JOBS.items():
+        scheduler.add_job(run_exclusive, "interval", hours=hours, args=(name, fn),
+                          id=name, max_instances=1, coalesce=True)
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import queue
+import smtplib
+import threading
+import time
+
+from flask_mail import BadHeaderError, Message
+
+from metrics import EMAIL_SECONDS, EMAILS
+
+_STOP = object()
+# Errors retrying won't fix
+PERMANENT_ERRORS = (BadHeaderError, smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+
+class RateLimiter:
+    """Token bucket shared by the delivery workers."""
+
+    def __init__(self, per_second, burst=None):
+        self.per_second = per_second
+        self.capacity = burst or max(1.0, per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.per_second:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.per_second)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.per_second
+            time.sleep(wait)
+
+
+# ---------------------------
+# Delivery workers
+# ---------------------------
+class MailDelivery:
+    """Bounded queue of outgoing mail drained by a few SMTP worker threads.
+
+    Each worker keeps one Flask-Mail connection open across messages (closed
+    after ``idle_timeout`` seconds without work, reopened on demand), so the
+    TCP/TLS handshake and login are paid once per worker instead of once per
+    email. Sends share a ``rate`` per second limit and transient failures
+    are retried with exponential backoff on a fresh connection.
+    """
+
+    def __init__(self, app, mail, workers=4, queue_size=1000, rate=10.0,
+                 retries=3, backoff=1.0, idle_timeout=30.0):
+        self.app = app
+        self.mail = mail
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.limiter = RateLimiter(rate)
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started_at = None
+        self.counters = dict.fromkeys(
+            ("queued", "rejected", "sent", "failed", "retried", "connections"), 0)
+        self.send_seconds = 0.0
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._started_at = time.monotonic()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"mail-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, to, subject, body, timeout=None):
+        """Queue a message; False if the queue stayed full for ``timeout`` seconds."""
+        self.start()
+        try:
+            self._queue.put((to, subject, body), timeout=timeout)
+        except queue.Full:
+            self._count("rejected")
+            return False
+        self._count("queued")
+        return True
+
+    def join(self):
+        """Block until every queued message was sent or given up on."""
+        self._queue.join()
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        stats["pending"] = self._queue.qsize()
+        stats["per_second"] = round(stats["sent"] / elapsed, 2) if elapsed else 0.0
+        stats["avg_send_ms"] = round(1000 * self.send_seconds / stats["sent"], 1) if stats["sent"] else 0.0
+        return stats
+
+    # --- worker ---
+    def _connect(self):
+        conn = self.mail.connect()
+        conn.__enter__()
+        self._count("connections")
+        return conn
+
+    @staticmethod
+    def _disconnect(conn):
+        try:
+            conn.__exit__(None, None, None)
+        except Exception:
+            pass
+
+    def _deliver(self, conn, to, subject, body):
+        msg = Message(subject, sender=self.app.config["MAIL_USERNAME"], recipients=[to])
+        msg.body = body
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                if conn is None:
+                    conn = self._connect()
+                started = time.perf_counter()
+                conn.send(msg)
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.counters["sent"] += 1
+                    self.send_seconds += elapsed
+                EMAIL_SECONDS.observe(elapsed)
+                EMAILS.inc(result="sent")
+                return conn
+            except PERMANENT_ERRORS:
+                self.app.logger.warning("mail to %s rejected", to)
+                break
+            except Exception:
+                if conn is not None:
+                    self._disconnect(conn)
+                    conn = None
+                if attempt == self.retries:
+                    self.app.logger.exception("mail to %s failed after %d attempts", to, attempt + 1)
+                    break
+                self._count("retried")
+                EMAILS.inc(result="retried")
+                time.sleep(delay)
+                delay *= 2
+        self._count("failed")
+        EMAILS.inc(result="failed")
+        return conn
+
+    def _run(self):
+        with self.app.app_context():
+            conn = None
+            while True:
+                try:
+                    job = self._queue.get(timeout=self.idle_timeout if conn is not None else None)
+                except queue.Empty:
+                    self._disconnect(conn)
+                    conn = None
+                    continue
+                try:
+                    if job is _STOP:
+                        break
+                    conn = self._deliver(conn, *job)
+                finally:
+                    self._queue.task_done()
+            if conn is not None:
+                self._disconnect(conn)
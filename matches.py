@@ -0,0 +1,187 @@
+"""Materialized per-user match lists: ``matches/<email>``.
+
+A view holds the ids of the unexpired scholarships a profile is eligible
+for, in listing order, and what it was built from:
+
+    {"ids": [...], "profile_hash": ..., "catalog": <catalog fingerprint>,
+     "as_of": "YYYY-MM-DD", "updated_at": ...}
+
+Pages use a view only while its ``profile_hash`` matches the profile they
+loaded and its ``catalog`` is current (see ``fresh_catalogs``), and
+rebuild it otherwise, so a stale view is never served even with no job
+running. It's rebuilt when the profile is submitted, and ``refresh`` (a
+job) brings views up to date after catalog changes and expiries: it
+patches only the users who match a changed scholarship now or held it
+before, and records that every other view it saw is current too.
+"""
+import hashlib
+import json
+from datetime import datetime
+
+from deadlines import today
+from profile_index import shared as profile_index
+
+# Job state: {"watermark", "catalog": fingerprint views were last brought up
+# to, "reconciled": [{"catalog": older fingerprint, "until": time}]}
+STATE = "matches"
+WRITE_BATCH = 500
+MAX_RECONCILED = 50     # older catalogs remembered; views built on earlier ones get rebuilt
+
+
+# ---------------------------
+# Views
+# ---------------------------
+def profile_hash(profile: dict) -> str:
+    blob = json.dumps(profile, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def view_for(ids, deadlines, fingerprint, profile=None, hash_=None, on=None):
+    """View over scholarship ``ids`` in the catalog with ``fingerprint``:
+    expired and unknown ones dropped, the rest sorted by ``deadlines.order_key``."""
+    on = on or today()
+    _, expired = deadlines.flags(on)
+    known = deadlines.by_id
+    kept = sorted((sid for sid in set(ids) if sid in known and sid not in expired),
+                  key=lambda sid: deadlines.order_key({"id": sid}))
+    return {
+        "ids": kept,
+        "profile_hash": profile_hash(profile) if profile is not None else hash_,
+        "catalog": fingerprint,
+        "as_of": on.isoformat(),
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+
+
+def build(profile, index, deadlines, fingerprint, on=None):
+    """Fresh view for ``profile`` over the catalog behind ``index``."""
+    return view_for((s["id"] for s in index.eligible(profile)), deadlines, fingerprint, profile, on=on)
+
+
+def fresh_catalogs(state, fingerprint):
+    """``{fingerprint: cutoff}`` for the catalogs a view can have been built
+    from and still be current with catalog ``fingerprint``.
+
+    That is the catalog itself (cutoff None), plus those the refresh job
+    reconciled into it: for each, views written before the run that did
+    it started (the cutoff) were patched if the changes affected them.
+    ``state`` is the job's state document.
+    """
+    if fingerprint is None:
+        return {}
+    catalogs = {fingerprint: None}
+    if state and state.get("catalog") == fingerprint:
+        for entry in state.get("reconciled", ()):
+            catalogs.setdefault(entry["catalog"], entry["until"])
+    return catalogs
+
+
+def _current(view, catalogs):
+    built_from = view.get("catalog")
+    if built_from not in catalogs:
+        return False
+    cutoff = catalogs[built_from]
+    return cutoff is None or view.get("updated_at", "") <= cutoff
+
+
+def is_fresh(view, profile, catalogs):
+    """Whether ``view`` is up to date for ``profile`` given ``fresh_catalogs``."""
+    return (view is not None and view.get("profile_hash") == profile_hash(profile)
+            and _current(view, catalogs))
+
+
+# ---------------------------
+# Incremental refresh (job)
+# ---------------------------
+def _write(store, views):
+    rows = list(views.items())
+    for start in range(0, len(rows), WRITE_BATCH):
+        store.write_matches(rows[start:start + WRITE_BATCH])
+
+
+def refresh(store, catalog, full=False, check=None):
+    """Bring every view up to date with what changed since the last run.
+
+    The first run (or ``full=True``) rebuilds all views from the profiles.
+    Afterwards only users touched by a change are rewritten: those whose
+    profile was submitted since the watermark get a full rebuild, and for
+    each scholarship that changed or expired, the users eligible for it now
+    and those whose view held it are patched in place. Only views current
+    with the catalog the previous run saw are patched (the changes since
+    then are exactly the ones applied here); any other is left for the
+    user's next page view to rebuild. The previous catalog is then
+    recorded as reconciled into this one, so the views this run didn't
+    need to touch stay current without being rewritten.
+
+    ``check`` (from the job runner) is called before anything is written;
+    it raises if this run lost its lease.
+    """
+    check = check or (lambda: None)
+    started = datetime.utcnow()
+    on = started.date()
+    state = store.get_state(STATE) or {}
+    watermark = None if full else state.get("watermark")
+    index, deadlines = catalog.index(), catalog.deadlines()
+    fingerprint = catalog.fingerprint(index.docs)
+
+    # every profile when there's no watermark, else those submitted since
+    changed_profiles = profile_index.refresh(store, watermark)
+    if watermark is None:
+        views = {email: build(profile, index, deadlines, fingerprint, on)
+                 for email, profile in changed_profiles.items()}
+        check()
+        _write(store, views)
+        store.set_state(STATE, {"watermark": started.isoformat(), "catalog": fingerprint, "reconciled": []})
+        return {"mode": "full", "views": len(views)}
+
+    rebuilt = {
+        email: build(profile, index, deadlines, fingerprint, on)
+        for email, profile in changed_profiles.items()
+        if isinstance(profile.get("submitted_at"), str) and profile["submitted_at"] > watermark
+    }
+
+    since = datetime.fromisoformat(watermark).date()
+    touched = set(store.changed_scholarship_ids(watermark))
+    touched |= {s["id"] for s in deadlines.expired(on=on)} - {s["id"] for s in deadlines.expired(on=since)}
+
+    # sid -> users eligible for it now; users who held it come from the views
+    eligible = {}
+    holders = set()
+    for sid in touched:
+        s = catalog.get(sid)
+        eligible[sid] = set(profile_index.match(s)) if s is not None else set()
+        holders |= store.match_holders(sid)
+    affected = (holders | set().union(*eligible.values())) - set(rebuilt)
+
+    previous = fresh_catalogs(state, state.get("catalog"))
+    patched = {}
+    for email in sorted(affected):
+        view = store.get_matches(email)
+        if view is None or not _current(view, previous):
+            continue    # (re)built on the user's next page view
+        ids = set(view["ids"])
+        for sid, users in eligible.items():
+            if email in users:
+                ids.add(sid)
+            else:
+                ids.discard(sid)
+        patched[email] = view_for(ids, deadlines, fingerprint, hash_=view.get("profile_hash"), on=on)
+
+    reconciled = {fp: until for fp, until in previous.items() if fp != fingerprint}
+    if state.get("catalog") in reconciled:
+        reconciled[state["catalog"]] = started.isoformat()
+    newest = sorted(reconciled.items(), key=lambda item: item[1], reverse=True)[:MAX_RECONCILED]
+
+    check()
+    _write(store, {**patched, **rebuilt})
+    store.set_state(STATE, {
+        "watermark": started.isoformat(),
+        "catalog": fingerprint,
+        "reconciled": [{"catalog": fp, "until": until} for fp, until in newest],
+    })
+    return {
+        "mode": "incremental",
+        "scholarships": len(touched),
+        "rebuilt": len(rebuilt),
+        "patched": len(patched),
+    }
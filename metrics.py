@@ -0,0 +1,394 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, abort, g, request
+from flask.signals import before_render_template, template_rendered
+
+METRICS_LOG = os.getenv("METRICS_LOG", "0") == "1"     # one JSON log line per request
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")             # if set, /metrics needs "Bearer <token>"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 120.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 20000, 100000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# ---------------------------
+# Metric types
+# ---------------------------
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, "") for n in self.labels), 0)
+
+    def total(self):
+        """Sum over every label set."""
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}     # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            i = bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = _labels(self.labels, key, [f'le="{bound}"'])
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _labels(self.labels, key, ['le="+Inf"'])
+                lines.append(f"{self.name}_bucket{le} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "scholarmatch_request_seconds", "Request latency, streamed responses included.",
+    ("route", "method", "status"))
+JOB_SECONDS = REGISTRY.histogram("scholarmatch_job_seconds", "Background job run time.", ("job",))
+RENDER_SECONDS = REGISTRY.histogram("scholarmatch_template_render_seconds", "Template render time.", ("template",))
+EMAIL_SECONDS = REGISTRY.histogram("scholarmatch_email_send_seconds", "SMTP send time per message.")
+EMAILS = REGISTRY.counter("scholarmatch_emails_total", "Emails handled by the delivery workers.", ("result",))
+FIRESTORE_READS = REGISTRY.counter(
+    "scholarmatch_firestore_reads_total", "Billed Firestore document reads.", ("scope",))
+FIRESTORE_WRITES = REGISTRY.counter(
+    "scholarmatch_firestore_writes_total", "Firestore document writes.", ("scope",))
+FIRESTORE_STREAMED = REGISTRY.counter(
+    "scholarmatch_firestore_docs_streamed_total", "Documents returned by Firestore queries.", ("scope",))
+READS_PER_CALL = REGISTRY.histogram(
+    "scholarmatch_firestore_reads_per_call", "Firestore reads per request or job run.",
+    ("scope",), buckets=COUNT_BUCKETS)
+
+
+# ---------------------------
+# Usage scopes
+# ---------------------------
+class Usage:
+    """Firestore and render costs of one request or job run."""
+
+    def __init__(self, name):
+        self.name = name
+        self.reads = 0
+        self.writes = 0
+        self.streamed = 0
+        self.render_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, field, amount):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def as_dict(self):
+        return {"reads": self.reads, "writes": self.writes, "streamed": self.streamed,
+                "render_ms": round(1000 * self.render_seconds, 2)}
+
+
+# fan_out copies the context, so reads on its threads land in the same Usage
+_current = contextvars.ContextVar("metrics_usage", default=None)
+
+
+def current_scope():
+    usage = _current.get()
+    return usage.name if usage is not None else "background"
+
+
+def _record(field, counter, amount):
+    if not amount:
+        return
+    usage = _current.get()
+    counter.inc(amount, scope=usage.name if usage is not None else "background")
+    if usage is not None:
+        usage.add(field, amount)
+
+
+def count_reads(n=1):
+    _record("reads", FIRESTORE_READS, n)
+
+
+def count_writes(n=1):
+    _record("writes", FIRESTORE_WRITES, n)
+
+
+def count_streamed(n=1):
+    _record("streamed", FIRESTORE_STREAMED, n)
+
+
+@contextmanager
+def job(name):
+    """Account a background job run: duration, reads and writes under ``job:<name>``."""
+    usage = Usage(f"job:{name}")
+    token = _current.set(usage)
+    started = time.perf_counter()
+    try:
+        yield usage
+    finally:
+        _current.reset(token)
+        JOB_SECONDS.observe(time.perf_counter() - started, job=name)
+        READS_PER_CALL.observe(usage.reads, scope=usage.name)
+
+
+# ---------------------------
+# Firestore accounting
+# ---------------------------
+class _Wrapped:
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+def _unwrap(obj):
+    return obj._target if isinstance(obj, _Wrapped) else obj
+
+
+class _Query(_Wrapped):
+    def where(self, *args, **kwargs):
+        return _Query(self._target.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs):
+        return _Query(self._target.order_by(*args, **kwargs))
+
+    def limit(self, *args, **kwargs):
+        return _Query(self._target.limit(*args, **kwargs))
+
+    def select(self, *args, **kwargs):
+        return _Query(self._target.select(*args, **kwargs))
+
+    def start_after(self, *args, **kwargs):
+        return _Query(self._target.start_after(*args, **kwargs))
+
+    def stream(self, *args, **kwargs):
+        n = 0
+        try:
+            for doc in self._target.stream(*args, **kwargs):
+                n += 1
+                yield doc
+        finally:
+            # Firestore bills one read for a query that returns nothing
+            count_reads(max(1, n))
+            count_streamed(n)
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+
+class _Collection(_Query):
+    def document(self, *args, **kwargs):
+        return _Document(self._target.document(*args, **kwargs))
+
+    def on_snapshot(self, callback):
+        def counted(docs, changes, read_time):
+            # the first snapshot reads every document, later ones the changes
+            count_reads(len(changes) or len(docs))
+            return callback(docs, changes, read_time)
+        return self._target.on_snapshot(counted)
+
+
+class _Document(_Wrapped):
+    def get(self, *args, **kwargs):
+        count_reads()
+        return self._target.get(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        count_writes()
+        return self._target.set(*args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        count_writes()
+        return self._target.update(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        count_writes()
+        return self._target.delete(*args, **kwargs)
+
+    def collection(self, *args, **kwargs):
+        return _Collection(self._target.collection(*args, **kwargs))
+
+
+class _Batch(_Wrapped):
+    def __init__(self, target):
+        super().__init__(target)
+        self._writes = 0
+
+    def set(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._target.set(_unwrap(reference), *args, **kwargs)
+
+    def update(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._target.update(_unwrap(reference), *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        self._writes += 1
+        return self._target.delete(_unwrap(reference), *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        result = self._target.commit(*args, **kwargs)
+        count_writes(self._writes)
+        self._writes = 0
+        return result
+
+
+class InstrumentedClient(_Wrapped):
+    """Firestore client wrapper counting reads, writes and streamed documents
+    against the current request or job. Anything else passes straight through."""
+
+    def collection(self, *args, **kwargs):
+        return _Collection(self._target.collection(*args, **kwargs))
+
+    def document(self, *args, **kwargs):
+        return _Document(self._target.document(*args, **kwargs))
+
+    def get_all(self, references, *args, **kwargs):
+        for snap in self._target.get_all([_unwrap(r) for r in references], *args, **kwargs):
+            count_reads()
+            yield snap
+
+    def batch(self, *args, **kwargs):
+        return _Batch(self._target.batch(*args, **kwargs))
+
+
+def instrument(client):
+    return InstrumentedClient(client)
+
+
+# ---------------------------
+# Flask hooks
+# ---------------------------
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def init_app(app):
+    @app.before_request
+    def start_request():
+        g._metrics_started = time.perf_counter()
+        g._metrics_usage = Usage(_route())
+        g._metrics_token = _current.set(g._metrics_usage)
+
+    @app.after_request
+    def note_status(response):
+        g._metrics_status = response.status_code
+        g._metrics_streamed = response.is_streamed
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        if g.pop("_metrics_streamed", False):
+            # stream_with_context tears down again once the body is sent
+            return
+        usage = g.pop("_metrics_usage", None)
+        if usage is None:
+            return
+        try:
+            _current.reset(g.pop("_metrics_token"))
+        except ValueError:
+            # a streamed response can finish in another context
+            _current.set(None)
+        elapsed = time.perf_counter() - g.pop("_metrics_started")
+        status = g.pop("_metrics_status", 500)
+        REQUEST_SECONDS.observe(elapsed, route=usage.name, method=request.method, status=status)
+        READS_PER_CALL.observe(usage.reads, scope=usage.name)
+        if METRICS_LOG:
+            app.logger.info(json.dumps({
+                "route": usage.name, "method": request.method, "status": status,
+                "ms": round(1000 * elapsed, 2), **usage.as_dict(),
+            }))
+
+    def render_started(sender, template, context, **extra):
+        g.setdefault("_metrics_renders", {})[id(template)] = time.perf_counter()
+
+    def render_finished(sender, template, context, **extra):
+        started = g.get("_metrics_renders", {}).pop(id(template), None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        RENDER_SECONDS.observe(elapsed, template=template.name or "string")
+        usage = _current.get()
+        if usage is not None:
+            usage.add("render_seconds", elapsed)
+
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
+
+    @app.route("/metrics")
+    def metrics():
+        if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+            abort(403)
+        return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
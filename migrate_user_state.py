@@ -0,0 +1,29 @@
+"""Backfill user_state/<email> from the saved and applied collections.
+
+Safe to run while the app is up: the app already writes both, reads fall
+back to (and repair from) the old rows for users not migrated yet, and
+the backfill only merges into existing documents.
+
+    python migrate_user_state.py --dry-run
+    python migrate_user_state.py
+"""
+import argparse
+import sys
+
+import storage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build per-user saved/applied state documents.")
+    parser.add_argument("--batch-size", type=int, default=500, help="documents per write batch (max 500)")
+    parser.add_argument("--dry-run", action="store_true", help="count the users without writing")
+    args = parser.parse_args(argv)
+
+    store = storage.open_storage()
+    users = store.migrate_user_states(batch_size=args.batch_size, dry_run=args.dry_run)
+    print(f"✅ {'Would migrate' if args.dry_run else 'Migrated'} {users} users.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,19 @@
+import re
+
+
+# ---------------------------
+# Numeric scholarship fields
+# ---------------------------
+def parse_amount(amount_str: str) -> int:
+    """Convert '₹1,80,000' or '100000' -> 180000"""
+    if not amount_str:
+        return 0
+    digits = re.sub(r"[^\d]", "", str(amount_str))
+    return int(digits) if digits else 0
+
+def amount_value(s: dict) -> int:
+    """Numeric amount: the ``amount_value`` stored at ingest, else parsed."""
+    value = s.get("amount_value")
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return parse_amount(s.get("amount", "0"))
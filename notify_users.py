@@ -1,6 +1,11 @@
-from flask_mail import Mail, Message
+from flask_mail import Mail
+from collections import defaultdict
 from datetime import datetime, timedelta
-from app import db, is_eligible  # import your firebase db and helper
+from app import store, catalog  # import the storage backend and catalog cache
+from eligibility_matrix import EligibilityMatrix
+from profile_index import shared as profile_index
+from mailer import MailDelivery
+import metrics
 import os
 # -----------------------------
 # Configure Flask-Mail
@@ -8,76 +13,146 @@ import os
 from app import app  # import your Flask app
 
 app.config.update(
-    MAIL_SERVER='smtp.gmail.com',
-    MAIL_PORT=587,
-    MAIL_USE_TLS=True,
+    MAIL_SERVER=os.getenv("MAIL_SERVER", "smtp.gmail.com"),
+    MAIL_PORT=int(os.getenv("MAIL_PORT", 587)),
+    MAIL_USE_TLS=os.getenv("MAIL_USE_TLS", "1") == "1",
     MAIL_USERNAME=os.getenv("MAIL_USERNAME"),  # your email
     MAIL_PASSWORD=os.getenv("MAIL_PASSWORD")   # app password
 )
 mail = Mail(app)
 
-def send_email(to, subject, body):
-    with app.app_context():
-        msg = Message(subject, sender=app.config['MAIL_USERNAME'], recipients=[to])
-        msg.body = body
-        mail.send(msg)
-def notify_new_or_closing_scholarships():
-    users = db.collection("users").stream()
-    today = datetime.utcnow()
-    for user_doc in users:
-        user_email = user_doc.id
-        profile_doc = db.collection("profiles").document(user_email).get()
-        if not profile_doc.exists:
-            continue
-        profile = profile_doc.to_dict()
-
-        # 1️⃣ New matched scholarships
-        matched = []
-        for sdoc in db.collection("scholarships").stream():
-            s = sdoc.to_dict()
-            s["id"] = sdoc.id
-
-            # Check eligibility
-            if not is_eligible(s, profile):
-                continue
-
-            # Skip if already saved/applied
-            saved_applied_ids = {d.id.split("__",1)[1] for d in db.collection("saved").where("email","==",user_email).stream()}
-            applied_ids = {d.id.split("__",1)[1] for d in db.collection("applied").where("email","==",user_email).stream()}
-            if s["id"] in saved_applied_ids or s["id"] in applied_ids:
-                continue
-
-            matched.append(s)
+# Outgoing mail goes through a pool of persistent SMTP connections
+delivery = MailDelivery(
+    app, mail,
+    workers=int(os.getenv("MAIL_WORKERS", 4)),
+    queue_size=int(os.getenv("MAIL_QUEUE_SIZE", 1000)),
+    rate=float(os.getenv("MAIL_RATE_LIMIT", 10)),      # messages per second, 0 = unlimited
+    retries=int(os.getenv("MAIL_RETRIES", 3)),
+)
 
-        if matched:
-            body = "🎓 New scholarships matching your profile:\n\n"
-            for s in matched:
-                body += f"{s['name']} - Apply here: {s.get('apply_link', 'No link')}\n"
-            send_email(user_email, "New Scholarships Available", body)
+# -----------------------------
+# Watermark
+# -----------------------------
+# Incremental runs only look at what changed after the last successful run
+WATERMARK = "notify_users"
+
+def load_watermark():
+    state = store.get_state(WATERMARK)
+    return state.get("watermark") if state else None
+
+def save_watermark(value):
+    store.set_state(WATERMARK, {"watermark": value})
+
+# -----------------------------
+# Notifier
+# -----------------------------
+def notify_new_or_closing_scholarships(full=False, check=None):
+    """Email users about new matches and saved/applied scholarships closing soon.
 
-        # 2️⃣ Scholarships closing soon (saved or matched)
-        closing_soon = []
-        for sdoc in db.collection("scholarships").stream():
-            s = sdoc.to_dict()
-            s["id"] = sdoc.id
+    Incremental by default: scholarships created or updated since the stored
+    watermark go through the reverse profile index to the users eligible for
+    them, profiles submitted since then are matched against the whole
+    catalog, and closing-soon reminders go out once, when a scholarship
+    enters the window. The first run just records the watermark.
+    ``full=True`` re-evaluates everything, as every run used to.
 
-            # Only saved or matched
-            saved_ids = {d.id.split("__",1)[1] for d in db.collection("saved").where("email","==",user_email).stream()}
-            applied_ids = {d.id.split("__",1)[1] for d in db.collection("applied").where("email","==",user_email).stream()}
+    ``check`` (from the job runner) is called before each user's mail and
+    before the watermark is saved; it raises if this run lost its lease.
+    """
+    check = check or (lambda: None)
+    started = datetime.utcnow()
+    reads_before = metrics.FIRESTORE_READS.total()
+    emails_queued = 0
 
-            if s["id"] not in saved_ids and s["id"] not in applied_ids:
-                continue
+    watermark = None if full else load_watermark()
+    if watermark is None and not full:
+        check()
+        save_watermark(started.isoformat())
+        return {"mode": "bootstrap", "watermark": started.isoformat()}
 
-            try:
-                deadline_dt = datetime.strptime(s.get("deadline","2099-12-31"), "%Y-%m-%d")
-                days_left = (deadline_dt - today).days
-                if 0 <= days_left <= 7:  # closing within 7 days
-                    closing_soon.append(s)
-            except:
-                continue
+    deadlines = catalog.deadlines()
+    scholarships = deadlines.docs
+    by_id = {s["id"]: s for s in scholarships}
+    closing_ids, expired_ids = deadlines.flags()
 
+    # 1️⃣ New matched scholarships: changed profiles x whole catalog,
+    #    changed scholarships -> eligible users through the profile index
+    new_matches = defaultdict(dict)
+    if full:
+        changed_profiles = dict(store.profiles())
+        for email, profile in changed_profiles.items():
+            profile_index.put(email, profile)
+        changed_ids = set()
+    else:
+        changed_profiles = {
+            email: profile
+            for email, profile in profile_index.refresh(store, watermark).items()
+            if isinstance(profile.get("submitted_at"), str) and profile["submitted_at"] > watermark
+        }
+        changed_ids = {sid for sid in store.changed_scholarship_ids(watermark) if sid in by_id}
+
+    emails = list(changed_profiles)
+    for i, eligible in EligibilityMatrix(scholarships).iter_matches([changed_profiles[e] for e in emails]):
+        for s in eligible:
+            new_matches[emails[i]][s["id"]] = s
+
+    for sid in sorted(changed_ids):
+        s = by_id[sid]
+        for email in profile_index.match(s):
+            new_matches[email][sid] = s
+
+    # 2️⃣ Scholarships closing soon (saved or applied), once per window:
+    #    everyone tracking one that just entered it, and anyone who saved or
+    #    applied to one already in it since the last run
+    if full:
+        entering = closing_ids
+    else:
+        since = datetime.fromisoformat(watermark).date()
+        entering = {s["id"] for s in deadlines.entering_window(since, on=started.date())}
+    closing_by_email = defaultdict(set)
+    if entering:
+        closing_by_email.update(store.trackers(entering))
+    if not full and closing_ids:
+        for email, sids in store.tracked_between(watermark, started.isoformat()).items():
+            late = sids & closing_ids
+            if late:
+                closing_by_email[email] |= late
+
+    candidates = [e for e, matches in new_matches.items() if matches]
+    tracked = store.tracked_by_email(None if full else candidates)
+
+    for user_email in sorted(set(candidates) | set(closing_by_email)):
+        check()
+        tracked_ids = tracked.get(user_email, set())
+        matched = [
+            s for sid, s in new_matches.get(user_email, {}).items()
+            if sid not in tracked_ids and sid not in expired_ids
+        ]
+        if matched:
+            body = "🎓 New scholarships matching your profile:\n\n"
+            for s in matched:
+                body += f"{s['name']} - Apply here: {s.get('apply_link', 'No link')}\n"
+            emails_queued += delivery.submit(user_email, "New Scholarships Available", body)
+
+        closing_soon = [by_id[sid] for sid in sorted(closing_by_email.get(user_email, ())) if sid in by_id]
         if closing_soon:
             body = "⏰ The following scholarships are closing soon:\n\n"
             for s in closing_soon:
                 body += f"{s['name']} - Deadline: {s.get('deadline','N/A')} - Apply: {s.get('apply_link','No link')}\n"
-            send_email(user_email, "Scholarships Closing Soon", body)
+            emails_queued += delivery.submit(user_email, "Scholarships Closing Soon", body)
+
+    delivery.join()
+    check()
+    save_watermark(started.isoformat())
+    stats = {
+        "mode": "full" if full else "incremental",
+        "watermark": started.isoformat(),
+        "changed_profiles": len(changed_profiles),
+        "changed_scholarships": len(changed_ids),
+        "closing_soon_scholarships": len(entering),
+        "emails_queued": emails_queued,
+        "firestore_reads": metrics.FIRESTORE_READS.total() - reads_before,
+        "mail": delivery.stats(),
+    }
+    app.logger.info("notify run: %s", stats)
+    return stats
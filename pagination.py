@@ -0,0 +1,76 @@
+import base64
+import binascii
+import json
+from bisect import bisect_right
+
+PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+
+
+# ---------------------------
+# Cursors
+# ---------------------------
+def encode_cursor(key) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Sort key encoded in ``cursor``; raises ValueError if it's malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("invalid cursor")
+    if not isinstance(key, list) or not all(isinstance(k, str) for k in key):
+        raise ValueError("invalid cursor")
+    return tuple(key)
+
+
+def parse_limit(value: str) -> int:
+    if not value.isdigit():
+        return PAGE_SIZE
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+def start_after(items, cursor_key, key) -> int:
+    """Index of the first item in sorted ``items`` whose key is past the cursor."""
+    if cursor_key is None:
+        return 0
+    return bisect_right(items, cursor_key, key=key)
+
+
+# ---------------------------
+# Page
+# ---------------------------
+class Page:
+    """Lazily iterated page of at most ``limit`` items.
+
+    ``items`` is any iterable in ``key`` order. Nothing is pulled from it
+    until the page is iterated, so it can be a generator feeding a streamed
+    template; ``next_cursor`` / ``next_url`` are known once iteration ends.
+    """
+
+    def __init__(self, items, key, limit=PAGE_SIZE, url_for_cursor=None):
+        self.items = items
+        self.key = key
+        self.limit = limit
+        self.url_for_cursor = url_for_cursor
+        self.next_cursor = None
+        self.count = 0
+
+    def __iter__(self):
+        last = None
+        for item in self.items:
+            if self.count == self.limit:
+                self.next_cursor = encode_cursor(self.key(last))
+                return
+            yield item
+            last = item
+            self.count += 1
+
+    @property
+    def next_url(self):
+        if self.next_cursor is None or self.url_for_cursor is None:
+            return None
+        return self.url_for_cursor(self.next_cursor)
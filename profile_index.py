@@ -0,0 +1,132 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+from eligibility import (
+    CATEGORICAL_FIELDS, NOMATCH, WILDCARD, Unindexable,
+    is_eligible, profile_keys, scholarship_keys,
+)
+
+
+# ---------------------------
+# Reverse (profile) index
+# ---------------------------
+class ProfileIndex:
+    """Index over ``profiles`` answering "who is eligible for this scholarship?".
+
+    Profiles are bucketed by each categorical match key, with income and
+    percentage kept in sorted lists. A scholarship's matches are found by
+    walking the smallest of its candidate sets (the buckets for its
+    non-wildcard fields, or the income/percentage slice) and checking the
+    remaining conditions on each candidate, so the cost follows the number
+    of plausible users rather than the size of the user base.
+    """
+
+    def __init__(self):
+        self._keys = {}         # email -> (categorical, income, percentage)
+        self._residual = {}     # email -> profile is_eligible must check itself
+        self._buckets = {f: {} for f in CATEGORICAL_FIELDS}
+        self._incomes = []      # sorted (income, email)
+        self._percentages = []  # sorted (percentage, email)
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._keys) + len(self._residual)
+
+    def __contains__(self, email):
+        return email in self._keys or email in self._residual
+
+    # --- maintenance ---
+    def put(self, email, profile):
+        with self._lock:
+            self.remove(email)
+            try:
+                keys = profile_keys(profile)
+            except Unindexable:
+                self._residual[email] = profile
+                return
+            if keys is None:
+                return
+            categorical, income, percentage = keys
+            for field, key in categorical.items():
+                if key is not NOMATCH:
+                    self._buckets[field].setdefault(key, set()).add(email)
+            insort(self._incomes, (income, email))
+            insort(self._percentages, (percentage, email))
+            self._keys[email] = keys
+
+    def remove(self, email):
+        with self._lock:
+            self._residual.pop(email, None)
+            keys = self._keys.pop(email, None)
+            if keys is None:
+                return
+            categorical, income, percentage = keys
+            for field, key in categorical.items():
+                if key is not NOMATCH:
+                    bucket = self._buckets[field][key]
+                    bucket.discard(email)
+                    if not bucket:
+                        del self._buckets[field][key]
+            del self._incomes[bisect_left(self._incomes, (income, email))]
+            del self._percentages[bisect_left(self._percentages, (percentage, email))]
+
+    def refresh(self, store, since=None):
+        """Load every profile on the first call, afterwards only those
+        submitted after ``since``; return what was read as ``{email: profile}``."""
+        changed = {}
+        for email, profile in store.profiles(since if self.loaded else None):
+            changed[email] = profile
+            self.put(email, profile)
+        self.loaded = True
+        return changed
+
+    # --- lookups ---
+    def _candidates(self, categorical, max_income, min_percentage):
+        best, size = self._keys, len(self._keys)
+        for field, key in categorical.items():
+            if key is not WILDCARD:
+                bucket = self._buckets[field].get(key, ())
+                if len(bucket) < size:
+                    best, size = bucket, len(bucket)
+        incomes, percentages = self._incomes, self._percentages
+        k = bisect_right(incomes, (max_income, "\U0010ffff"))
+        if k < size:
+            best, size = (incomes[i][1] for i in range(k)), k
+        k = bisect_left(percentages, (min_percentage, ""))
+        if len(percentages) - k < size:
+            best = (percentages[i][1] for i in range(k, len(percentages)))
+        return best
+
+    def match(self, s: dict):
+        """Emails of the indexed profiles eligible for scholarship ``s``."""
+        with self._lock:
+            try:
+                keys = scholarship_keys(s)
+            except Unindexable:
+                # an unhashable gender/religion/disability (a Firestore array
+                # or map) can only equal another one, i.e. a residual profile
+                return [e for e, profile in self._residual.items() if is_eligible(s, profile)]
+            if keys is None:
+                return []
+
+            categorical, max_income, min_percentage = keys
+            constrained = [(f, k) for f, k in categorical.items() if k is not WILDCARD]
+            matches = []
+            for email in self._candidates(categorical, max_income, min_percentage):
+                user_keys = self._keys.get(email)
+                if user_keys is None:
+                    continue
+                user_categorical, income, percentage = user_keys
+                if income > max_income or percentage < min_percentage:
+                    continue
+                if all(user_categorical[f] == k for f, k in constrained):
+                    matches.append(email)
+            matches.extend(e for e, profile in self._residual.items() if is_eligible(s, profile))
+            return matches
+
+
+# One per process, shared by the jobs that need it (the notifier and the
+# match refresh); after the first load each refresh reads only the
+# profiles submitted since the caller's watermark
+shared = ProfileIndex()
@@ -0,0 +1,75 @@
+from eligibility import NOMATCH, WILDCARD, Unindexable, profile_keys, scholarship_keys
+
+# Derived map written on every scholarship so Firestore can filter on it:
+# is_eligible lowercases some fields and not others, which a server-side
+# equality filter can't do, so the normalized keys are stored alongside.
+MATCH_FIELD = "match"
+# Fields pushed into the query. Firestore allows at most 30 disjunctions per
+# query, so only three "in" filters (2 x 2 x 2 combinations); religion,
+# disability and min_percentage are checked in Python on what comes back.
+PUSHED_FIELDS = ("education", "gender", "category", "state")
+# What each wildcard is stored as: the value is_eligible treats as "anyone",
+# after the same normalization, so no real value can collide with it
+WILDCARD_VALUE = {"gender": "Any", "category": "any", "state": "all"}
+# Fields a stored match map depends on
+SOURCE_FIELDS = ("education", "gender", "category", "state", "religion", "disability",
+                 "max_income", "min_percentage")
+
+_INT64 = range(-2 ** 63, 2 ** 63)
+
+
+# ---------------------------
+# Write side
+# ---------------------------
+def match_fields(s: dict) -> dict:
+    """The ``match`` map to store on scholarship ``s``.
+
+    ``{}`` for a scholarship nobody can match, ``{"residual": True}`` for one
+    whose values a Firestore filter can't compare the way is_eligible does
+    (it's fetched with every query and checked in Python).
+    """
+    try:
+        keys = scholarship_keys(s)
+    except Unindexable:
+        return {"residual": True}
+    if keys is None:
+        return {}
+    categorical, max_income, _ = keys
+    if any(categorical[f] is not WILDCARD and not isinstance(categorical[f], str) for f in PUSHED_FIELDS) \
+            or max_income not in _INT64:
+        return {"residual": True}
+    match = {f: WILDCARD_VALUE[f] if categorical[f] is WILDCARD else categorical[f] for f in PUSHED_FIELDS}
+    match["max_income"] = max_income
+    return match
+
+
+# ---------------------------
+# Query side
+# ---------------------------
+def plan(profile: dict):
+    """Server-side filters, ``[(field_path, op, value)]``, that every
+    scholarship ``profile`` is eligible for passes.
+
+    The filters select a superset: run is_eligible on what comes back.
+    Returns None if the profile matches nothing and raises Unindexable if
+    it can't be expressed as filters (non-string values and the like).
+    """
+    keys = profile_keys(profile)
+    if keys is None:
+        return None
+    categorical, income, _ = keys
+    if any(categorical[f] is not NOMATCH and not isinstance(categorical[f], str) for f in PUSHED_FIELDS) \
+            or income not in _INT64:
+        raise Unindexable(profile)
+
+    filters = [(f"{MATCH_FIELD}.education", "==", categorical["education"])]
+    for field in ("gender", "category", "state"):
+        values = [WILDCARD_VALUE[field]]
+        if categorical[field] is not NOMATCH and categorical[field] != values[0]:
+            values.append(categorical[field])
+        filters.append((f"{MATCH_FIELD}.{field}", "in", values))
+    filters.append((f"{MATCH_FIELD}.max_income", ">=", income))
+    return filters
+
+
+RESIDUAL_FILTER = (f"{MATCH_FIELD}.residual", "==", True)
@@ -0,0 +1,32 @@
+from bisect import bisect_left, bisect_right
+
+
+# ---------------------------
+# Range index
+# ---------------------------
+class RangeIndex:
+    """One numeric field of a scholarship list, sorted for range filters.
+
+    ``value(s)`` extracts the number; documents where it raises or returns
+    None are left out of every range.
+    """
+
+    def __init__(self, docs, value):
+        self.docs = docs
+        pairs = []
+        for s in docs:
+            try:
+                v = value(s)
+            except Exception:
+                continue
+            if v is not None:
+                pairs.append((v, s["id"]))
+        pairs.sort()
+        self.values = [v for v, _ in pairs]
+        self.ids = [sid for _, sid in pairs]
+
+    def at_least(self, low) -> set:
+        return set(self.ids[bisect_left(self.values, low):])
+
+    def at_most(self, high) -> set:
+        return set(self.ids[:bisect_right(self.values, high)])
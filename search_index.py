@@ -0,0 +1,210 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from urllib.parse import urlparse
+
+# Field -> weight of a hit in that field
+FIELDS = {
+    "name": 3.0,
+    "provider": 2.0,
+    "category": 1.0,
+    "state": 1.0,
+    "education": 1.0,
+}
+EXACT, PREFIX, FUZZY = 1.0, 0.6, 0.4
+
+# Shorthand students type for words that appear in scholarship names
+ALIASES = {
+    "engg": "engineering",
+    "engr": "engineering",
+    "govt": "government",
+    "intl": "international",
+    "univ": "university",
+}
+DOMAIN_NOISE = {"www", "http", "https", "com", "org", "net", "in", "co"}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word: str) -> str:
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text) -> list:
+    if not isinstance(text, str):
+        return []
+    return [_stem(ALIASES.get(w, w)) for w in _WORD.findall(text.lower())]
+
+
+def _provider_text(s: dict) -> str:
+    parts = [s.get("provider") or ""]
+    link = s.get("apply_link")
+    if isinstance(link, str):
+        host = urlparse(link if "//" in link else "//" + link).hostname or ""
+        parts.extend(w for w in re.split(r"[.\-]", host) if w not in DOMAIN_NOISE)
+    return " ".join(p for p in parts if isinstance(p, str))
+
+
+def _deletes(term: str) -> set:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Damerau-Levenshtein distance <= 1 (one insert, delete, substitute or swap)."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+# ---------------------------
+# Search index
+# ---------------------------
+class SearchIndex:
+    """In-memory full-text index over the scholarship catalog.
+
+    Terms from the name, provider / apply_link domain, category, state and
+    education go into an inverted index; a sorted term list answers prefix
+    lookups and a one-deletion neighbourhood map answers typo-tolerant ones.
+    ``sync`` applies a new catalog snapshot incrementally, re-indexing only
+    the documents that changed.
+    """
+
+    def __init__(self, min_fuzzy_len=4):
+        self.min_fuzzy_len = min_fuzzy_len
+        self.docs = None
+        self.version = 0
+        self._indexed = {}      # id -> indexed doc
+        self._doc_terms = {}    # id -> {term: weight}
+        self._postings = {}     # term -> {id: weight}
+        self._terms = []        # sorted postings keys
+        self._by_delete = {}    # one-deletion variant -> {term}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._indexed)
+
+    # --- maintenance ---
+    def _add_term(self, term):
+        insort(self._terms, term)
+        if len(term) >= self.min_fuzzy_len:
+            for variant in _deletes(term) | {term}:
+                self._by_delete.setdefault(variant, set()).add(term)
+
+    def _drop_term(self, term):
+        del self._terms[bisect_left(self._terms, term)]
+        if len(term) >= self.min_fuzzy_len:
+            for variant in _deletes(term) | {term}:
+                terms = self._by_delete[variant]
+                terms.discard(term)
+                if not terms:
+                    del self._by_delete[variant]
+
+    def add(self, s: dict):
+        sid = s["id"]
+        self.remove(sid)
+        weights = {}
+        texts = {field: s.get(field) for field in FIELDS}
+        texts["provider"] = _provider_text(s)
+        for field, text in texts.items():
+            for term in tokenize(text):
+                weights[term] = max(weights.get(term, 0.0), FIELDS[field])
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._add_term(term)
+            postings[sid] = weight
+        self._indexed[sid] = s
+        self._doc_terms[sid] = weights
+
+    def remove(self, sid):
+        weights = self._doc_terms.pop(sid, None)
+        if weights is None:
+            return
+        del self._indexed[sid]
+        for term in weights:
+            postings = self._postings[term]
+            del postings[sid]
+            if not postings:
+                del self._postings[term]
+                self._drop_term(term)
+
+    def sync(self, docs, version=0):
+        """Bring the index in line with ``docs``, touching only what changed."""
+        with self._lock:
+            if docs is self.docs:
+                return
+            current = {s["id"]: s for s in docs}
+            for sid in list(self._indexed):
+                if sid not in current:
+                    self.remove(sid)
+            for sid, s in current.items():
+                if self._indexed.get(sid) != s:
+                    self.add(s)
+                else:
+                    self._indexed[sid] = s
+            self.docs = docs
+            self.version = version
+
+    # --- lookups ---
+    def _expand(self, token):
+        """``{term: quality}`` for the index terms a query token can mean."""
+        found = {}
+        if token in self._postings:
+            found[token] = EXACT
+        if len(token) >= 2:
+            k = bisect_left(self._terms, token)
+            while k < len(self._terms) and self._terms[k].startswith(token):
+                found.setdefault(self._terms[k], PREFIX)
+                k += 1
+        if len(token) >= self.min_fuzzy_len:
+            for variant in _deletes(token) | {token}:
+                for term in self._by_delete.get(variant, ()):
+                    if term not in found and _within_one_edit(token, term):
+                        found[term] = FUZZY
+        return found
+
+    def scores(self, query: str) -> dict:
+        """``{scholarship id: relevance}`` for documents matching every query word."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return {}
+        with self._lock:
+            result = None
+            for token in tokens:
+                token_scores = {}
+                for term, quality in self._expand(token).items():
+                    for sid, weight in self._postings[term].items():
+                        score = weight * quality
+                        if score > token_scores.get(sid, 0.0):
+                            token_scores[sid] = score
+                if result is None:
+                    result = token_scores
+                else:
+                    result = {sid: result[sid] + score for sid, score in token_scores.items() if sid in result}
+                if not result:
+                    return {}
+            return result
+
+    def search(self, query: str, limit=None):
+        """Matching scholarships, most relevant first."""
+        scores = self.scores(query)
+        ranked = sorted(scores, key=lambda sid: (-scores[sid], sid))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self._indexed[sid] for sid in ranked]
@@ -0,0 +1,803 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+
+from eligibility import (
+    CATEGORICAL_FIELDS, NOMATCH, WILDCARD, EligibilityIndex, Unindexable,
+    is_eligible, profile_keys, scholarship_keys,
+)
+from query_plan import _INT64, MATCH_FIELD, RESIDUAL_FILTER, SOURCE_FIELDS, match_fields, plan
+
+BACKEND = os.getenv("STORAGE_BACKEND", "firestore")      # "firestore" or "sqlite"
+SQLITE_PATH = os.getenv("SQLITE_PATH", "scholarmatch.db")
+FIREBASE_KEY = os.getenv("FIREBASE_KEY", "firebase-key.json")
+# Answer eligibility with filtered Firestore queries instead of the
+# in-memory index over the catalog snapshot (costs a read per match)
+FIRESTORE_PUSHDOWN = os.getenv("FIRESTORE_PUSHDOWN", "0") == "1"
+
+TRACKED = ("saved", "applied")
+TIMESTAMP_FIELD = {"saved": "saved_at", "applied": "applied_at"}
+USER_STATE = "user_state"     # Firestore: user_state/<email>, saved and applied in one document
+
+
+# ---------------------------
+# Interface
+# ---------------------------
+class Storage:
+    """Everything the app, the notifier and the importer read or write.
+
+    Documents are plain dicts; scholarships carry their id under ``"id"``.
+    ``saved`` and ``applied`` rows are addressed by (email, scholarship id)
+    and read per user as one state: ``{"saved": {id: at}, "applied": {id: at},
+    "updated_at": at of the last change}``.
+    """
+
+    # --- users / profiles ---
+    def get_user(self, email):
+        raise NotImplementedError
+
+    def put_user(self, email, user):
+        raise NotImplementedError
+
+    def get_profile(self, email):
+        raise NotImplementedError
+
+    def put_profile(self, email, profile):
+        raise NotImplementedError
+
+    def profiles(self, since=None):
+        """``(email, profile)`` for every profile, or those submitted after ``since``."""
+        raise NotImplementedError
+
+    # --- scholarships ---
+    def scholarships(self):
+        raise NotImplementedError
+
+    def get_scholarships(self, ids):
+        """The scholarships among ``ids`` that exist, in any order."""
+        raise NotImplementedError
+
+    def changed_scholarship_ids(self, since):
+        """Ids of scholarships created or updated after ``since``."""
+        raise NotImplementedError
+
+    def watch_scholarships(self, callback):
+        """Call ``callback(scholarships)`` on every change; None if unsupported."""
+        return None
+
+    def scholarships_version(self):
+        """A cheap value that changes whenever scholarships do, or None."""
+        return None
+
+    def eligibility_index(self, scholarships):
+        """An object with ``eligible(profile)`` over ``scholarships`` answered by
+        the backend itself, or None to use the in-memory EligibilityIndex."""
+        return None
+
+    def stored_hashes(self, ids):
+        """``{id: {"content_hash", "created_at"}}`` for the stored ``ids``."""
+        raise NotImplementedError
+
+    def write_scholarships(self, docs):
+        """Replace ``[(id, doc)]`` atomically (at most 500 at a time)."""
+        raise NotImplementedError
+
+    def update_scholarship(self, sid, fields):
+        raise NotImplementedError
+
+    def backfill_match_fields(self):
+        """Rewrite derived match data on stored scholarships that lack it or
+        have it stale; returns how many were updated."""
+        return 0
+
+    # --- saved / applied ---
+    def user_state(self, email):
+        """Everything ``email`` has saved or applied to, in one read."""
+        raise NotImplementedError
+
+    def tracked_ids(self, kind, email):
+        """Scholarship ids ``email`` has in ``kind`` ("saved" or "applied")."""
+        return set(self.user_state(email)[kind])
+
+    def track(self, kind, email, sid, at):
+        """Record ``sid`` in ``kind`` for ``email`` unless it's already there."""
+        raise NotImplementedError
+
+    def tracked_by_email(self, emails=None):
+        """``{email: {scholarship id}}`` over saved and applied, for ``emails`` or everyone."""
+        raise NotImplementedError
+
+    def trackers(self, ids):
+        """``{email: {scholarship id}}`` for users who saved or applied to ``ids``."""
+        raise NotImplementedError
+
+    def tracked_between(self, since, until):
+        """``{email: {scholarship id}}`` users started tracking after ``since``,
+        up to ``until``: saved or applied then, and neither before."""
+        raise NotImplementedError
+
+    def migrate_user_states(self, batch_size=500, dry_run=False):
+        """Build per-user state from the saved/applied rows; returns the
+        number of users written. A no-op where state isn't stored apart."""
+        return 0
+
+    # --- materialized matches (see matches.py) ---
+    def get_matches(self, email):
+        raise NotImplementedError
+
+    def put_matches(self, email, view):
+        self.write_matches([(email, view)])
+
+    def write_matches(self, views):
+        """Replace ``[(email, view)]`` (at most 500 at a time)."""
+        raise NotImplementedError
+
+    def match_holders(self, sid):
+        """Emails whose view lists scholarship ``sid``."""
+        raise NotImplementedError
+
+    # --- job state ---
+    def get_state(self, name):
+        raise NotImplementedError
+
+    def set_state(self, name, data):
+        """Merge ``data`` into the state document ``name``."""
+        raise NotImplementedError
+
+
+# ---------------------------
+# Firestore
+# ---------------------------
+class FirestoreStorage(Storage):
+    TRACKED_QUERY_LIMIT = 200   # beyond this many users, stream saved/applied once instead
+    IN_QUERY_LIMIT = 30         # Firestore's cap on values in an "in" filter
+    GET_ALL_CHUNK = 100
+
+    def __init__(self, db):
+        self.db = db
+
+    def _doc(self, collection, key):
+        doc = self.db.collection(collection).document(key).get()
+        return doc.to_dict() if doc.exists else None
+
+    def get_user(self, email):
+        return self._doc("users", email)
+
+    def put_user(self, email, user):
+        self.db.collection("users").document(email).set(user)
+
+    def get_profile(self, email):
+        return self._doc("profiles", email)
+
+    def put_profile(self, email, profile):
+        self.db.collection("profiles").document(email).set(profile)
+
+    def profiles(self, since=None):
+        query = self.db.collection("profiles")
+        if since is not None:
+            query = query.where("submitted_at", ">", since)
+        for doc in query.stream():
+            yield doc.id, doc.to_dict()
+
+    @staticmethod
+    def _with_id(doc):
+        s = doc.to_dict()
+        s["id"] = doc.id
+        return s
+
+    def scholarships(self):
+        return [self._with_id(doc) for doc in self.db.collection("scholarships").stream()]
+
+    def get_scholarships(self, ids):
+        col = self.db.collection("scholarships")
+        ids = list(ids)
+        found = []
+        for start in range(0, len(ids), self.GET_ALL_CHUNK):
+            refs = [col.document(sid) for sid in ids[start:start + self.GET_ALL_CHUNK]]
+            found.extend(self._with_id(doc) for doc in self.db.get_all(refs) if doc.exists)
+        return found
+
+    def changed_scholarship_ids(self, since):
+        changed = set()
+        for field in ("created_at", "updated_at"):
+            for doc in self.db.collection("scholarships").where(field, ">", since).stream():
+                changed.add(doc.id)
+        return changed
+
+    def eligibility_index(self, scholarships):
+        return QueryEligibility(self, scholarships) if FIRESTORE_PUSHDOWN else None
+
+    def eligible_ids(self, profile):
+        """Ids of the scholarships that pass the pushed-down filters for
+        ``profile`` (a superset of its matches), or None if it can't be
+        expressed as a query."""
+        try:
+            filters = plan(profile)
+        except Unindexable:
+            return None
+        if filters is None:
+            return []
+        col = self.db.collection("scholarships")
+        query = col
+        for field, op, value in filters:
+            query = query.where(field, op, value)
+        ids = []
+        # only ids are needed: the documents come from the catalog snapshot
+        for q in (query, col.where(*RESIDUAL_FILTER)):
+            ids.extend(doc.id for doc in q.select([f"{MATCH_FIELD}.max_income"]).stream())
+        return ids
+
+    def watch_scholarships(self, callback):
+        def on_snapshot(col_snapshot, changes, read_time):
+            callback([self._with_id(doc) for doc in col_snapshot])
+        return self.db.collection("scholarships").on_snapshot(on_snapshot)
+
+    def stored_hashes(self, ids):
+        col = self.db.collection("scholarships")
+        refs = [col.document(sid) for sid in ids]
+        stored = {}
+        for snap in self.db.get_all(refs, field_paths=["content_hash", "created_at"]):
+            if snap.exists:
+                stored[snap.id] = snap.to_dict()
+        return stored
+
+    def write_scholarships(self, docs):
+        col = self.db.collection("scholarships")
+        batch = self.db.batch()
+        for sid, doc in docs:
+            batch.set(col.document(sid), {**doc, MATCH_FIELD: match_fields(doc)})
+        batch.commit()
+
+    def update_scholarship(self, sid, fields):
+        ref = self.db.collection("scholarships").document(sid)
+        if any(f in fields for f in SOURCE_FIELDS):
+            doc = ref.get()
+            if doc.exists:
+                fields = {**fields, MATCH_FIELD: match_fields({**doc.to_dict(), **fields})}
+        # update() replaces the match map instead of merging into it
+        ref.update(fields)
+
+    def backfill_match_fields(self):
+        updated = 0
+        for s in self.scholarships():
+            match = match_fields(s)
+            if s.get(MATCH_FIELD) != match:
+                self.db.collection("scholarships").document(s["id"]).update({MATCH_FIELD: match})
+                updated += 1
+        return updated
+
+    # saved/applied rows stay the per-scholarship index (``trackers``); each
+    # change also lands in user_state/<email>, in the same batch, so pages
+    # read one document. A state document is trusted once it's marked
+    # ``migrated``, i.e. holds every row written before it existed.
+    @staticmethod
+    def _state(data):
+        data = data or {}
+        return {
+            "saved": dict(data.get("saved") or {}),
+            "applied": dict(data.get("applied") or {}),
+            "updated_at": data.get("updated_at") or "",
+        }
+
+    def _legacy_rows(self, query, kind):
+        for d in query.stream():
+            if "__" in d.id:
+                data = d.to_dict()
+                yield data.get("email"), d.id.split("__", 1)[1], data.get(TIMESTAMP_FIELD[kind]) or ""
+
+    def _migrated(self, rows, stored=None):
+        """State document for ``email`` merged with legacy ``{kind: {sid: at}}``."""
+        state = self._state(stored)
+        for kind in TRACKED:
+            state[kind].update(rows.get(kind, {}))
+        times = [state["updated_at"]] + [at for kind in TRACKED for at in rows.get(kind, {}).values()]
+        state["updated_at"] = max(t for t in times if isinstance(t, str))
+        return {**rows, "updated_at": state["updated_at"], "migrated": True}, state
+
+    def user_state(self, email):
+        ref = self.db.collection(USER_STATE).document(email)
+        doc = ref.get()
+        stored = doc.to_dict() if doc.exists else None
+        if stored is not None and stored.get("migrated"):
+            return self._state(stored)
+        # not migrated yet: read the old rows and write the document (a
+        # merge, so saves racing with this aren't lost)
+        rows = {kind: {} for kind in TRACKED}
+        for kind in TRACKED:
+            for _, sid, at in self._legacy_rows(self.db.collection(kind).where("email", "==", email), kind):
+                rows[kind][sid] = at
+        data, state = self._migrated(rows, stored)
+        ref.set(data, merge=True)
+        return state
+
+    def track(self, kind, email, sid, at):
+        if sid in self.user_state(email)[kind]:
+            return False
+        batch = self.db.batch()
+        batch.set(self.db.collection(kind).document(f"{email}__{sid}"),
+                  {"email": email, "scholarship_id": sid, TIMESTAMP_FIELD[kind]: at})
+        batch.set(self.db.collection(USER_STATE).document(email), {kind: {sid: at}, "updated_at": at}, merge=True)
+        batch.commit()
+        return True
+
+    def tracked_by_email(self, emails=None):
+        tracked = defaultdict(set)
+        if emails is not None:
+            # one point read per user; users without a migrated state
+            # document go through the saved/applied queries below
+            col = self.db.collection(USER_STATE)
+            emails = list(emails)
+            pending = set(emails)
+            for start in range(0, len(emails), self.GET_ALL_CHUNK):
+                refs = [col.document(e) for e in emails[start:start + self.GET_ALL_CHUNK]]
+                for doc in self.db.get_all(refs):
+                    data = doc.to_dict() if doc.exists else None
+                    if data and data.get("migrated"):
+                        state = self._state(data)
+                        tracked[doc.id] = set(state["saved"]) | set(state["applied"])
+                        pending.discard(doc.id)
+            if not pending:
+                return tracked
+            emails = sorted(pending)
+        # small sets are read with per-user queries, large ones with one
+        # pass over each collection
+        for kind in TRACKED:
+            if emails is not None and len(emails) <= self.TRACKED_QUERY_LIMIT:
+                queries = [self.db.collection(kind).where("email", "==", e) for e in emails]
+            else:
+                queries = [self.db.collection(kind)]
+            for query in queries:
+                for d in query.stream():
+                    if "__" in d.id:
+                        tracked[d.get("email")].add(d.id.split("__", 1)[1])
+        return tracked
+
+    def trackers(self, ids):
+        trackers = defaultdict(set)
+        ids = sorted(ids)
+        for kind in TRACKED:
+            for start in range(0, len(ids), self.IN_QUERY_LIMIT):
+                query = self.db.collection(kind).where("scholarship_id", "in", ids[start:start + self.IN_QUERY_LIMIT])
+                for d in query.stream():
+                    trackers[d.get("email")].add(d.get("scholarship_id"))
+        return trackers
+
+    def tracked_between(self, since, until):
+        recent = {kind: set() for kind in TRACKED}
+        for kind in TRACKED:
+            field = TIMESTAMP_FIELD[kind]
+            query = self.db.collection(kind).where(field, ">", since).where(field, "<=", until)
+            for d in query.stream():
+                recent[kind].add((d.get("email"), d.get("scholarship_id")))
+        # a row in only one collection may have an older one in the other
+        tracked = defaultdict(set)
+        for kind, other in zip(TRACKED, reversed(TRACKED)):
+            check = sorted(recent[kind] - recent[other])
+            earlier = set()
+            for start in range(0, len(check), self.GET_ALL_CHUNK):
+                refs = [self.db.collection(other).document(f"{e}__{sid}") for e, sid in check[start:start + self.GET_ALL_CHUNK]]
+                earlier |= {tuple(doc.id.split("__", 1)) for doc in self.db.get_all(refs) if doc.exists}
+            for email, sid in recent[kind] - earlier:
+                tracked[email].add(sid)
+        return tracked
+
+    def migrate_user_states(self, batch_size=500, dry_run=False):
+        rows = defaultdict(lambda: {kind: {} for kind in TRACKED})
+        for kind in TRACKED:
+            for email, sid, at in self._legacy_rows(self.db.collection(kind), kind):
+                rows[email][kind][sid] = at
+        if dry_run:
+            return len(rows)
+        col = self.db.collection(USER_STATE)
+        emails = sorted(rows)
+        for start in range(0, len(emails), batch_size):
+            chunk = emails[start:start + batch_size]
+            # read first so updated_at never moves back past a save made
+            # since the rows were streamed; the merge keeps its keys too
+            stored = {doc.id: doc.to_dict() for doc in self.db.get_all([col.document(e) for e in chunk])
+                      if doc.exists}
+            batch = self.db.batch()
+            for email in chunk:
+                data, _ = self._migrated(rows[email], stored.get(email))
+                batch.set(col.document(email), data, merge=True)
+            batch.commit()
+        return len(emails)
+
+    def get_matches(self, email):
+        return self._doc("matches", email)
+
+    def write_matches(self, views):
+        col = self.db.collection("matches")
+        batch = self.db.batch()
+        for email, view in views:
+            batch.set(col.document(email), view)
+        batch.commit()
+
+    def match_holders(self, sid):
+        query = self.db.collection("matches").where("ids", "array_contains", sid).select(["as_of"])
+        return {doc.id for doc in query.stream()}
+
+    def get_state(self, name):
+        return self._doc("jobs", name)
+
+    def set_state(self, name, data):
+        self.db.collection("jobs").document(name).set(data, merge=True)
+
+
+# ---------------------------
+# SQLite
+# ---------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (email TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS profiles (email TEXT PRIMARY KEY, submitted_at TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS profiles_submitted_at ON profiles (submitted_at);
+
+-- match columns hold what is_eligible compares, normalized; NULL is a
+-- wildcard. matchable: 0 matches nothing, 1 use the columns, 2 residual
+-- (values SQL can't compare like Python does; checked with is_eligible)
+CREATE TABLE IF NOT EXISTS scholarships (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    created_at TEXT,
+    updated_at TEXT,
+    matchable INTEGER NOT NULL,
+    gender TEXT, education TEXT, category TEXT, state TEXT, religion TEXT, disability TEXT,
+    max_income INTEGER, min_percentage INTEGER
+);
+CREATE INDEX IF NOT EXISTS scholarships_match
+    ON scholarships (education, max_income, min_percentage) WHERE matchable = 1;
+CREATE INDEX IF NOT EXISTS scholarships_residual ON scholarships (matchable) WHERE matchable = 2;
+CREATE INDEX IF NOT EXISTS scholarships_created_at ON scholarships (created_at);
+CREATE INDEX IF NOT EXISTS scholarships_updated_at ON scholarships (updated_at);
+
+CREATE TABLE IF NOT EXISTS saved (
+    email TEXT NOT NULL, scholarship_id TEXT NOT NULL, at TEXT,
+    PRIMARY KEY (email, scholarship_id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS saved_scholarship ON saved (scholarship_id);
+CREATE INDEX IF NOT EXISTS saved_at ON saved (at);
+CREATE TABLE IF NOT EXISTS applied (
+    email TEXT NOT NULL, scholarship_id TEXT NOT NULL, at TEXT,
+    PRIMARY KEY (email, scholarship_id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS applied_scholarship ON applied (scholarship_id);
+CREATE INDEX IF NOT EXISTS applied_at ON applied (at);
+
+CREATE TABLE IF NOT EXISTS matches (email TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS match_ids (
+    scholarship_id TEXT NOT NULL, email TEXT NOT NULL,
+    PRIMARY KEY (scholarship_id, email)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS match_ids_email ON match_ids (email);
+
+CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, data TEXT NOT NULL);
+
+-- bumped on every scholarship change so the catalog can poll cheaply
+CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL);
+INSERT OR IGNORE INTO versions VALUES ('scholarships', 0);
+CREATE TRIGGER IF NOT EXISTS scholarships_insert AFTER INSERT ON scholarships
+    BEGIN UPDATE versions SET version = version + 1 WHERE name = 'scholarships'; END;
+CREATE TRIGGER IF NOT EXISTS scholarships_update AFTER UPDATE ON scholarships
+    BEGIN UPDATE versions SET version = version + 1 WHERE name = 'scholarships'; END;
+CREATE TRIGGER IF NOT EXISTS scholarships_delete AFTER DELETE ON scholarships
+    BEGIN UPDATE versions SET version = version + 1 WHERE name = 'scholarships'; END;
+"""
+
+def _dumps(doc):
+    return json.dumps(doc, default=str, ensure_ascii=False)
+
+
+def match_columns(s: dict):
+    """``(matchable, gender, education, category, state, religion, disability,
+    max_income, min_percentage)`` for the scholarships table."""
+    try:
+        keys = scholarship_keys(s)
+    except Unindexable:
+        return (2,) + (None,) * 8
+    if keys is None:
+        return (0,) + (None,) * 8
+    categorical, max_income, min_percentage = keys
+    if any(categorical[f] is not WILDCARD and not isinstance(categorical[f], str) for f in CATEGORICAL_FIELDS) \
+            or max_income not in _INT64 or min_percentage not in _INT64:
+        return (2,) + (None,) * 8
+    values = [None if categorical[f] is WILDCARD else categorical[f] for f in CATEGORICAL_FIELDS]
+    return (1, *values, max_income, min_percentage)
+
+
+class QueryEligibility:
+    """``eligible(profile)`` for a catalog snapshot, answered by the backend's
+    ``eligible_ids`` query.
+
+    The query may return a superset (``exact=False``): those candidates are
+    checked with is_eligible. Profiles it can't express (None) fall back to
+    an in-memory EligibilityIndex over the snapshot.
+    """
+
+    def __init__(self, store, scholarships, exact=False):
+        self.store = store
+        self.docs = scholarships
+        self.exact = exact
+        self._position = {s["id"]: i for i, s in enumerate(scholarships)}
+        self._fallback = None
+
+    def eligible(self, profile):
+        ids = self.store.eligible_ids(profile)
+        if ids is None:
+            if self._fallback is None:
+                self._fallback = EligibilityIndex(self.docs)
+            return self._fallback.eligible(profile)
+        docs, position = self.docs, self._position
+        found = sorted({position[sid] for sid in ids if sid in position})
+        if self.exact:
+            return [docs[i] for i in found]
+        return [docs[i] for i in found if is_eligible(docs[i], profile)]
+
+
+class SQLiteStorage(Storage):
+    """Single-file local backend with the same behaviour as Firestore.
+
+    Each thread gets its own connection (WAL mode, so readers don't block
+    the writer). Eligibility is a query over normalized, indexed match
+    columns instead of a Python loop over the catalog.
+    """
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _one(self, sql, params=()):
+        row = self._conn().execute(sql, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # --- users / profiles ---
+    def get_user(self, email):
+        return self._one("SELECT data FROM users WHERE email = ?", (email,))
+
+    def put_user(self, email, user):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", (email, _dumps(user)))
+
+    def get_profile(self, email):
+        return self._one("SELECT data FROM profiles WHERE email = ?", (email,))
+
+    def put_profile(self, email, profile):
+        self.put_profiles([(email, profile)])
+
+    def put_profiles(self, rows):
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO profiles VALUES (?, ?, ?)",
+                ((email, p.get("submitted_at") if isinstance(p.get("submitted_at"), str) else None, _dumps(p))
+                 for email, p in rows))
+
+    def profiles(self, since=None):
+        if since is None:
+            cursor = self._conn().execute("SELECT email, data FROM profiles")
+        else:
+            cursor = self._conn().execute("SELECT email, data FROM profiles WHERE submitted_at > ?", (since,))
+        for email, data in cursor:
+            yield email, json.loads(data)
+
+    # --- scholarships ---
+    @staticmethod
+    def _with_id(sid, data):
+        s = json.loads(data)
+        s["id"] = sid
+        return s
+
+    def scholarships(self):
+        return [self._with_id(sid, data) for sid, data in self._conn().execute("SELECT id, data FROM scholarships")]
+
+    def get_scholarships(self, ids):
+        found = []
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self._conn().execute(
+                f"SELECT id, data FROM scholarships WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            found.extend(self._with_id(sid, data) for sid, data in rows)
+        return found
+
+    def changed_scholarship_ids(self, since):
+        rows = self._conn().execute(
+            "SELECT id FROM scholarships WHERE created_at > ? UNION SELECT id FROM scholarships WHERE updated_at > ?",
+            (since, since))
+        return {sid for (sid,) in rows}
+
+    def scholarships_version(self):
+        return self._conn().execute("SELECT version FROM versions WHERE name = 'scholarships'").fetchone()[0]
+
+    def eligibility_index(self, scholarships):
+        return QueryEligibility(self, scholarships, exact=True)
+
+    def eligible_ids(self, profile):
+        """Ids of the scholarships ``profile`` is eligible for."""
+        try:
+            keys = profile_keys(profile)
+        except Unindexable:
+            keys = False
+        if keys is None:
+            return []
+        params = None
+        if keys:
+            categorical, income, percentage = keys
+            values = [None if categorical[f] is NOMATCH else categorical[f] for f in CATEGORICAL_FIELDS]
+            if all(v is None or isinstance(v, str) for v in values) and income in _INT64 and percentage in _INT64:
+                params = (*values, income, percentage)
+        if params is None:
+            # values SQL can't compare the way Python does: check every row
+            return [s["id"] for s in self.scholarships() if is_eligible(s, profile)]
+
+        conn = self._conn()
+        ids = [sid for (sid,) in conn.execute(
+            """SELECT id FROM scholarships
+               WHERE matchable = 1 AND education = ?2
+                 AND (gender IS NULL OR gender = ?1)
+                 AND (category IS NULL OR category = ?3)
+                 AND (state IS NULL OR state = ?4)
+                 AND (religion IS NULL OR religion = ?5)
+                 AND (disability IS NULL OR disability = ?6)
+                 AND max_income >= ?7 AND min_percentage <= ?8""", params)]
+        for sid, data in conn.execute("SELECT id, data FROM scholarships WHERE matchable = 2"):
+            if is_eligible(json.loads(data), profile):
+                ids.append(sid)
+        return ids
+
+    def stored_hashes(self, ids):
+        stored = {}
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self._conn().execute(
+                f"SELECT id, data FROM scholarships WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            for sid, data in rows:
+                doc = json.loads(data)
+                stored[sid] = {k: doc[k] for k in ("content_hash", "created_at") if k in doc}
+        return stored
+
+    def write_scholarships(self, docs):
+        rows = []
+        for sid, doc in docs:
+            created_at, updated_at = doc.get("created_at"), doc.get("updated_at")
+            rows.append((sid, _dumps(doc),
+                         created_at if isinstance(created_at, str) else None,
+                         updated_at if isinstance(updated_at, str) else None,
+                         *match_columns(doc)))
+        with self._conn() as conn:
+            conn.executemany("INSERT OR REPLACE INTO scholarships VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+
+    def update_scholarship(self, sid, fields):
+        stored = self.get_scholarships([sid])
+        doc = stored[0] if stored else {}
+        doc.pop("id", None)
+        doc.update(fields)
+        self.write_scholarships([(sid, doc)])
+
+    # --- saved / applied ---
+    def user_state(self, email):
+        state = {"saved": {}, "applied": {}, "updated_at": ""}
+        rows = self._conn().execute(
+            "SELECT 'saved', scholarship_id, at FROM saved WHERE email = ?1 "
+            "UNION ALL SELECT 'applied', scholarship_id, at FROM applied WHERE email = ?1", (email,))
+        for kind, sid, at in rows:
+            state[kind][sid] = at or ""
+            state["updated_at"] = max(state["updated_at"], at or "")
+        return state
+
+    def track(self, kind, email, sid, at):
+        with self._conn() as conn:
+            cursor = conn.execute(f"INSERT OR IGNORE INTO {_table(kind)} VALUES (?, ?, ?)", (email, sid, at))
+        return cursor.rowcount == 1
+
+    def track_many(self, kind, rows):
+        """Bulk ``track`` for ``[(email, sid, at)]``."""
+        with self._conn() as conn:
+            conn.executemany(f"INSERT OR IGNORE INTO {_table(kind)} VALUES (?, ?, ?)", rows)
+
+    def tracked_by_email(self, emails=None):
+        tracked = defaultdict(set)
+        conn = self._conn()
+        for kind in TRACKED:
+            if emails is None:
+                rows = conn.execute(f"SELECT email, scholarship_id FROM {kind}")
+                for email, sid in rows:
+                    tracked[email].add(sid)
+                continue
+            emails = list(emails)
+            for start in range(0, len(emails), 500):
+                chunk = emails[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT email, scholarship_id FROM {kind} WHERE email IN ({','.join('?' * len(chunk))})", chunk)
+                for email, sid in rows:
+                    tracked[email].add(sid)
+        return tracked
+
+    def trackers(self, ids):
+        trackers = defaultdict(set)
+        ids = list(ids)
+        conn = self._conn()
+        for kind in TRACKED:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT email, scholarship_id FROM {kind} WHERE scholarship_id IN ({','.join('?' * len(chunk))})",
+                    chunk)
+                for email, sid in rows:
+                    trackers[email].add(sid)
+        return trackers
+
+    def tracked_between(self, since, until):
+        tracked = defaultdict(set)
+        conn = self._conn()
+        for kind, other in zip(TRACKED, reversed(TRACKED)):
+            rows = conn.execute(
+                f"SELECT email, scholarship_id FROM {kind} AS t WHERE at > ? AND at <= ? AND NOT EXISTS "
+                f"(SELECT 1 FROM {other} AS o WHERE o.email = t.email AND o.scholarship_id = t.scholarship_id "
+                f"AND o.at <= ?)", (since, until, since))
+            for email, sid in rows:
+                tracked[email].add(sid)
+        return tracked
+
+    # --- materialized matches ---
+    def get_matches(self, email):
+        return self._one("SELECT data FROM matches WHERE email = ?", (email,))
+
+    def write_matches(self, views):
+        views = list(views)
+        with self._conn() as conn:
+            conn.executemany("INSERT OR REPLACE INTO matches VALUES (?, ?)",
+                             ((email, _dumps(view)) for email, view in views))
+            conn.executemany("DELETE FROM match_ids WHERE email = ?", ((email,) for email, _ in views))
+            conn.executemany("INSERT INTO match_ids VALUES (?, ?)",
+                             ((sid, email) for email, view in views for sid in view["ids"]))
+
+    def match_holders(self, sid):
+        rows = self._conn().execute("SELECT email FROM match_ids WHERE scholarship_id = ?", (sid,))
+        return {email for (email,) in rows}
+
+    # --- job state ---
+    def get_state(self, name):
+        return self._one("SELECT data FROM state WHERE name = ?", (name,))
+
+    def set_state(self, name, data):
+        with self._conn() as conn:
+            row = conn.execute("SELECT data FROM state WHERE name = ?", (name,)).fetchone()
+            merged = {**(json.loads(row[0]) if row else {}), **data}
+            conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (name, _dumps(merged)))
+
+
+def _table(kind):
+    if kind not in TRACKED:
+        raise ValueError(f"unknown collection {kind!r}")
+    return kind
+
+
+# ---------------------------
+# Setup
+# ---------------------------
+def open_storage(backend=None):
+    """The configured backend; Firestore initializes firebase_admin first."""
+    backend = backend or BACKEND
+    if backend == "sqlite":
+        return SQLiteStorage(SQLITE_PATH)
+    if backend != "firestore":
+        raise ValueError(f"unknown STORAGE_BACKEND {backend!r}")
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    import metrics
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(FIREBASE_KEY))
+    return FirestoreStorage(metrics.instrument(firestore.client()))
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from bench.fake_firestore import FakeFirestore
+from eligibility import EligibilityIndex, is_eligible
+from storage import FirestoreStorage, QueryEligibility, SQLiteStorage
+
+# (common values, odd values) per field. Most draws are common so plenty of
+# pairs match; the rest cover what is_eligible also has to cope with: case
+# variants, blanks, numbers stored as strings, unhashable and junk values.
+SCHOLARSHIP_VALUES = {
+    "gender": (["Any", "Female", "Male"], ["male", "", None, 1, ["x"]]),
+    "education": (["UG", "PG"], ["ug", "12th", "", None, 5]),
+    "category": (["Any", "GEN", "SC"], ["any", "sc", "", None]),
+    "state": (["All", "Kerala", "Delhi"], ["all", "kerala", "", None, 3]),
+    "religion": (["Any", "Hindu"], ["Muslim", "any", "", None, ["l"]]),
+    "disability": (["Any", "No"], ["Yes", "", None]),
+    "max_income": ([250000, 500000, 99999999], [0, "300000", "x", None, 2.5, True, 10 ** 20]),
+    "min_percentage": ([0, 50, 60], ["85", 100, "bad", None]),
+}
+PROFILE_VALUES = {
+    "gender": (["Female", "Male"], ["Any", "", None, 1]),
+    "education": (["UG", "PG"], ["ug", "12th", "", None]),
+    "category": (["GEN", "SC"], ["sc", "any", "", None]),
+    "state": (["Kerala", "Delhi"], ["kerala", "all", "", None]),
+    "religion": (["Hindu"], ["Muslim", "Any", "", None]),
+    "disability": (["No"], ["Yes", "Any", "", None]),
+    "income": ([50000, 100000, 250000], [0, "250000", 300000, "x", None, -10 ** 20]),
+    "percentage": ([60, 85, 100], [0, 50, "90", "bad", None]),
+}
+
+
+def _random_doc(rng, values):
+    doc = {}
+    for field, (common, odd) in values.items():
+        if rng.random() < 0.95:
+            doc[field] = rng.choice(common if rng.random() < 0.9 else odd)
+    return doc
+
+
+def _random_catalog(rng, size=60):
+    return {f"s{i}": _random_doc(rng, SCHOLARSHIP_VALUES) for i in range(rng.randint(0, size))}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_index_agrees_with_is_eligible(seed):
+    rng = random.Random(seed)
+    for _ in range(20):
+        scholarships = [_random_doc(rng, SCHOLARSHIP_VALUES) for _ in range(rng.randint(0, 60))]
+        index = EligibilityIndex(scholarships)
+        for _ in range(30):
+            profile = _random_doc(rng, PROFILE_VALUES)
+            expected = [s for s in scholarships if is_eligible(s, profile)]
+            got = index.eligible(profile)
+            assert got == expected, profile
+            # same documents, in collection order
+            assert all(a is b for a, b in zip(got, expected))
+
+
+def test_empty_catalog():
+    assert EligibilityIndex([]).eligible({"education": "UG"}) == []
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_sqlite_eligible_ids_agree_with_is_eligible(seed, tmp_path):
+    rng = random.Random(seed)
+    store = SQLiteStorage(str(tmp_path / "scholarmatch.db"))
+    catalog = _random_catalog(rng, size=120)
+    store.write_scholarships(catalog.items())
+    for _ in range(100):
+        profile = _random_doc(rng, PROFILE_VALUES)
+        expected = {sid for sid, s in catalog.items() if is_eligible(s, profile)}
+        assert set(store.eligible_ids(profile)) == expected, profile
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_firestore_pushdown_agrees_with_is_eligible(seed):
+    rng = random.Random(seed)
+    store = FirestoreStorage(FakeFirestore())
+    catalog = _random_catalog(rng, size=120)
+    store.write_scholarships(catalog.items())
+    # edits go through update(), which has to recompute the match map
+    for sid in rng.sample(sorted(catalog), len(catalog) // 4):
+        fields = _random_doc(rng, SCHOLARSHIP_VALUES)
+        store.update_scholarship(sid, fields)
+        catalog[sid] = {**catalog[sid], **fields}
+
+    docs = store.scholarships()
+    index = QueryEligibility(store, docs)
+    for _ in range(100):
+        profile = _random_doc(rng, PROFILE_VALUES)
+        expected = {sid for sid, s in catalog.items() if is_eligible(s, profile)}
+        # the filters may let extra documents through, never drop a match
+        ids = store.eligible_ids(profile)
+        if ids is not None:
+            assert expected <= set(ids), profile
+        got = index.eligible(profile)
+        assert got == [s for s in docs if is_eligible(s, profile)], profile
+        assert {s["id"] for s in got} == expected